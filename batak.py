@@ -1,28 +1,214 @@
 import random
 
+from results_store import RESULTS_FILE, ResultWriter
+
+RANKS = "23456789TJQKA"
+SUITS = "♠♡♢♣"
+
+# A hand is an int with bit (suit_index * 13 + rank_index) set for each card
+# held, so every suit occupies its own contiguous 13-bit field.
+SUIT_MASKS = [0x1FFF << (13 * suit) for suit in range(4)]
+RANK_COLUMN = 1 | 1 << 13 | 1 << 26 | 1 << 39
+HIGH_MASK = 0xF << 9 | 0xF << 22 | 0xF << 35 | 0xF << 48
+HIGH_RANK = RANKS.index("J")
+FULL_MASK = (1 << 52) - 1
+
 
 class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
+    # There are exactly 52 cards, built once into CARDS; Card(rank, suit)
+    # returns the interned one, so cards compare and hash by id.
+    __slots__ = ("rank", "suit", "rank_index", "suit_index", "id")
+
+    def __new__(cls, rank, suit):
+        return CARDS[SUITS.index(suit) * 13 + RANKS.index(rank)]
+
+    def __eq__(self, other):
+        if not isinstance(other, Card):
+            return NotImplemented
+        return self.id == other.id
+
+    def __hash__(self):
+        return self.id
+
+    def __reduce__(self):
+        return Card, (self.rank, self.suit)
 
     def __repr__(self):
         return f"{self.rank}{self.suit}"
 
 
+def _intern_card(card_id):
+    card = object.__new__(Card)
+    card.suit_index, card.rank_index = divmod(card_id, 13)
+    card.suit = SUITS[card.suit_index]
+    card.rank = RANKS[card.rank_index]
+    card.id = card_id
+    return card
+
+
+CARDS = tuple(_intern_card(card_id) for card_id in range(52))
+
+
+def hand_mask(hand):
+    mask = 0
+    for card in hand:
+        mask |= 1 << card.id
+    return mask
+
+
+def hand_cards(mask):
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
+
+def lowest_card(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def highest_card(mask):
+    return mask.bit_length() - 1
+
+
+# The two helpers below rank cards across suits the way min()/max() with a
+# rank key do over a hand sorted by (suit, rank): ties go to the lowest suit.
+def min_rank_card(mask):
+    folded = (mask | mask >> 13 | mask >> 26 | mask >> 39) & 0x1FFF
+    rank = lowest_card(folded)
+    return rank + lowest_card((mask >> rank) & RANK_COLUMN)
+
+
+def max_rank_card(mask):
+    folded = (mask | mask >> 13 | mask >> 26 | mask >> 39) & 0x1FFF
+    rank = highest_card(folded)
+    return rank + lowest_card((mask >> rank) & RANK_COLUMN)
+
+
+def follow_options(hand, led, trump):
+    valid = hand & SUIT_MASKS[led]
+    if not valid:
+        valid = hand & SUIT_MASKS[trump]
+    return valid or hand
+
+
+def legal_moves(hand, led, trump, trump_played):
+    # Follow suit, otherwise trump, otherwise anything; trump is only led
+    # before it has been played when nothing else is left.
+    if led is None:
+        if not trump_played and hand & ~SUIT_MASKS[trump]:
+            return hand & ~SUIT_MASKS[trump]
+        return hand
+    return follow_options(hand, led, trump)
+
+
+# Cards of the same suit that outrank each card.
+ABOVE = [SUIT_MASKS[card // 13] & ~((2 << card) - 1) for card in range(52)]
+
+
+def beats(card, winning, trump):
+    # Whether `card` takes the trick from the card currently winning it.
+    if card // 13 == winning // 13:
+        return card > winning
+    return card // 13 == trump
+
+
+class IllegalMove(ValueError):
+    pass
+
+
+class Rules:
+    # A rule variant, as the legal moves for a hand given the led suit, the
+    # card currently winning the trick and whether trump has been played.
+    # must_trump: a player out of the led suit has to trump if able.
+    # must_overtake: a player has to beat the winning card if able, going
+    # higher in the led suit or overtrumping a trumped trick.
+    # trump_lead_needs_break: trump can only be led before it has been
+    # played when nothing else is left.
+    def __init__(
+        self, must_trump=True, must_overtake=False, trump_lead_needs_break=True
+    ):
+        self.must_trump = must_trump
+        self.must_overtake = must_overtake
+        self.trump_lead_needs_break = trump_lead_needs_break
+
+    def legal_moves(self, hand, led, winning, trump, trump_played):
+        if led is None:
+            if self.trump_lead_needs_break and not trump_played:
+                others = hand & ~SUIT_MASKS[trump]
+                if others:
+                    return others
+            return hand
+        follow = hand & SUIT_MASKS[led]
+        if follow:
+            if self.must_overtake and winning // 13 == led:
+                return follow & ABOVE[winning] or follow
+            return follow
+        if self.must_trump:
+            trumps = hand & SUIT_MASKS[trump]
+            if trumps:
+                if self.must_overtake and winning // 13 == trump:
+                    return trumps & ABOVE[winning] or trumps
+                return trumps
+        return hand
+
+
+# CLASSIC is the game as the engine has always played it, the same moves as
+# legal_moves(); BATAK adds the obligation to beat the winning card.
+CLASSIC = Rules()
+BATAK = Rules(must_overtake=True)
+RULES = {"classic": CLASSIC, "batak": BATAK}
+
+
+def rank_mask(min_rank):
+    # Every card of rank index min_rank or above; rank_mask(HIGH_RANK) is
+    # HIGH_MASK.
+    return RANK_COLUMN * (0x1FFF ^ ((1 << min_rank) - 1))
+
+
+def longest_suit(hand):
+    counts = [(hand & suit_mask).bit_count() for suit_mask in SUIT_MASKS]
+    return counts.index(max(counts))
+
+
 class Deck:
-    ranks = "23456789TJQKA"
-    suits = "♠♡♢♣"
+    ranks = RANKS
+    suits = SUITS
 
-    def __init__(self):
-        self.cards = [Card(rank, suit) for rank in self.ranks for suit in self.suits]
-        random.shuffle(self.cards)
+    # `cards` holds card ids; shuffling permutes ids rather than Card objects
+    # and deal() maps them back to the interned cards.
+    def __init__(self, rng=random, cards=None):
+        if cards is None:
+            cards = list(range(52))
+            rng.shuffle(cards)
+        self.cards = cards
 
     def deal(self, n):
-        return [self.cards[i::n] for i in range(n)]
+        return [[CARDS[card] for card in sorted(self.cards[i::n])] for i in range(n)]
+
+    def deal_masks(self, n):
+        masks = []
+        for i in range(n):
+            mask = 0
+            for card in self.cards[i::n]:
+                mask |= 1 << card
+            masks.append(mask)
+        return masks
 
 
 class AIPersonality:
+    # Personalities that set this get start_play() once trump is known and
+    # observe_card() for every card played, including their own.
+    observes_play = False
+
+    def start_play(self, seat, bids, highest_bidder, trump):
+        pass
+
+    def observe_card(self, player, card):
+        pass
+
     def lead_card(self, hand, trump_suit, trump_played):
         raise NotImplementedError()
 
@@ -35,216 +221,459 @@ class AIPersonality:
     def choose_trump_suit(self, hand):
         raise NotImplementedError()
 
+    # The engine calls the *_bits methods with bitmask hands and suit indices
+    # and expects card ids back; `legal` is the mask of cards the rules allow,
+    # which other callers may leave out. These defaults adapt list-based
+    # personalities.
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        return self.lead_card(hand_cards(hand), SUITS[trump], trump_played).id
 
-class ConservativePlayer(AIPersonality):
-    def lead_card(self, hand, trump_suit, trump_played):
-        sorted_hand = sorted(
-            hand,
-            key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)),
-        )
-        if not trump_played:
-            sorted_hand = [card for card in sorted_hand if card.suit != trump_suit]
-        return sorted_hand[0]
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        return self.follow_card(
+            hand_cards(hand), SUITS[led], SUITS[trump], trump_played
+        ).id
 
-    def follow_card(self, hand, led_suit, trump_suit, trump_played):
-        valid_cards = [card for card in hand if card.suit == led_suit]
-        if not valid_cards:
-            valid_cards = [card for card in hand if card.suit == trump_suit]
+    def bid_bits(self, hand, current_bids):
+        return self.bid(hand_cards(hand), current_bids)
 
-        if not valid_cards:
-            valid_cards = hand
+    def choose_trump_bits(self, hand):
+        return SUITS.index(self.choose_trump_suit(hand_cards(hand)))
+
+
+class BitmaskPersonality(AIPersonality):
+    # Cards counted as high when bidding and playing.
+    high_mask = HIGH_MASK
+
+    def lead_card(self, hand, trump_suit, trump_played):
+        return CARDS[
+            self.lead_bits(hand_mask(hand), SUITS.index(trump_suit), trump_played)
+        ]
 
-        return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+    def follow_card(self, hand, led_suit, trump_suit, trump_played):
+        return CARDS[
+            self.follow_bits(
+                hand_mask(hand),
+                SUITS.index(led_suit),
+                SUITS.index(trump_suit),
+                trump_played,
+            )
+        ]
 
     def bid(self, hand, current_bids):
-        num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
-        bid_value = max(1, num_high_cards // 2)
-        return max(current_bids + [0]) + bid_value
+        return self.bid_bits(hand_mask(hand), current_bids)
 
     def choose_trump_suit(self, hand):
-        suit_counts = {suit: 0 for suit in Deck.suits}
-        for card in hand:
-            suit_counts[card.suit] += 1
-        return max(suit_counts, key=suit_counts.get)
+        return SUITS[self.choose_trump_bits(hand_mask(hand))]
 
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        raise NotImplementedError()
 
-class AggressivePlayer(AIPersonality):
-    def lead_card(self, hand, trump_suit, trump_played):
-        if not trump_played:
-            non_trump_cards = [card for card in hand if card.suit != trump_suit]
-            if non_trump_cards:
-                return max(non_trump_cards, key=lambda c: Deck.ranks.index(c.rank))
-        return max(hand, key=lambda c: Deck.ranks.index(c.rank))
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        raise NotImplementedError()
 
-    def follow_card(self, hand, led_suit, trump_suit, trump_played):
-        valid_cards = [card for card in hand if card.suit == led_suit]
-        if not valid_cards:
-            valid_cards = [card for card in hand if card.suit == trump_suit]
+    def bid_bits(self, hand, current_bids):
+        raise NotImplementedError()
+
+    def choose_trump_bits(self, hand):
+        raise NotImplementedError()
+
+
+class ConservativePlayer(BitmaskPersonality):
+    bid_divisor = 2
+    bid_floor = 1
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        if legal is None:
+            legal = legal_moves(hand, None, trump, trump_played)
+        return lowest_card(legal)
+
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        if legal is None:
+            legal = follow_options(hand, led, trump)
+        return min_rank_card(legal)
+
+    def bid_bits(self, hand, current_bids):
+        num_high_cards = (hand & self.high_mask).bit_count()
+        bid_value = max(self.bid_floor, num_high_cards // self.bid_divisor)
+        return max(current_bids + [0]) + bid_value
+
+    def choose_trump_bits(self, hand):
+        return longest_suit(hand)
 
-        if not valid_cards:
-            valid_cards = hand
 
-        high_cards = [card for card in valid_cards if card.rank in "JQKA"]
+class AggressivePlayer(BitmaskPersonality):
+    bid_divisor = 1
+    bid_floor = 0
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        if legal is None:
+            legal = legal_moves(hand, None, trump, trump_played)
+        return max_rank_card(legal)
+
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        valid_cards = legal if legal is not None else follow_options(hand, led, trump)
+        high_cards = valid_cards & self.high_mask
         if high_cards:
-            if trump_played:
-                return min(high_cards, key=lambda c: Deck.ranks.index(c.rank))
-            else:
-                return max(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+            valid_cards = high_cards
+        if trump_played:
+            return min_rank_card(valid_cards)
         else:
-            if trump_played:
-                return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
-            else:
-                return max(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return max_rank_card(valid_cards)
 
-    def bid(self, hand, current_bids):
-        num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
-        bid_value = num_high_cards
+    def bid_bits(self, hand, current_bids):
+        num_high_cards = (hand & self.high_mask).bit_count()
+        bid_value = max(self.bid_floor, num_high_cards // self.bid_divisor)
         return max(current_bids + [0]) + bid_value
 
-    def choose_trump_suit(self, hand):
-        suit_counts = {suit: 0 for suit in Deck.suits}
-        for card in hand:
-            suit_counts[card.suit] += 1
-        return max(suit_counts, key=suit_counts.get)
+    def choose_trump_bits(self, hand):
+        return longest_suit(hand)
 
 
-class BalancedPlayer(AIPersonality):
-    def lead_card(self, hand, trump_suit, trump_played):
-        high_cards = [card for card in hand if card.rank in "JQKA"]
-        low_cards = [card for card in hand if card.rank not in "JQKA"]
+class BalancedPlayer(BitmaskPersonality):
+    bid_divisor = 3
+    bid_floor = 1
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        if legal is None:
+            legal = legal_moves(hand, None, trump, trump_played)
+        high_cards = legal & self.high_mask
+        low_cards = legal & ~self.high_mask
 
         if not trump_played:
-            high_cards = [card for card in high_cards if card.suit != trump_suit]
-            low_cards = [card for card in low_cards if card.suit != trump_suit]
+            high_cards &= ~SUIT_MASKS[trump]
+            low_cards &= ~SUIT_MASKS[trump]
 
         if high_cards:
-            return max(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return max_rank_card(high_cards)
         elif low_cards:
-            return min(low_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return min_rank_card(low_cards)
         else:
-            return max(hand, key=lambda c: Deck.ranks.index(c.rank))
-
-    def follow_card(self, hand, led_suit, trump_suit, trump_played):
-        valid_cards = [card for card in hand if card.suit == led_suit]
-        if not valid_cards:
-            valid_cards = [card for card in hand if card.suit == trump_suit]
-
-        if not valid_cards:
-            valid_cards = hand
+            return max_rank_card(legal)
 
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        valid_cards = legal if legal is not None else follow_options(hand, led, trump)
         if trump_played:
-            return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return min_rank_card(valid_cards)
         else:
-            return max(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return max_rank_card(valid_cards)
 
-    def bid(self, hand, current_bids):
-        num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
-        bid_value = max(1, num_high_cards // 3)
+    def bid_bits(self, hand, current_bids):
+        num_high_cards = (hand & self.high_mask).bit_count()
+        bid_value = max(self.bid_floor, num_high_cards // self.bid_divisor)
         return max(current_bids + [0]) + bid_value
 
-    def choose_trump_suit(self, hand):
-        suit_counts = {suit: 0 for suit in Deck.suits}
-        for card in hand:
-            suit_counts[card.suit] += 1
-        return max(suit_counts, key=suit_counts.get)
+    def choose_trump_bits(self, hand):
+        return longest_suit(hand)
 
 
-class OpportunisticPlayer(AIPersonality):
-    def lead_card(self, hand, trump_suit, trump_played):
-        high_cards = [card for card in hand if card.rank in "JQKA"]
+class OpportunisticPlayer(BitmaskPersonality):
+    bid_divisor = 4
+    bid_floor = 1
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        if legal is None:
+            legal = legal_moves(hand, None, trump, trump_played)
+        high_cards = legal & self.high_mask
         if not trump_played:
-            high_cards = [card for card in high_cards if card.suit != trump_suit]
+            high_cards &= ~SUIT_MASKS[trump]
         if high_cards:
-            return min(high_cards, key=lambda c: Deck.ranks.index(c.rank))
-        return min(hand, key=lambda c: Deck.ranks.index(c.rank))
-
-    def follow_card(self, hand, led_suit, trump_suit, trump_played):
-        valid_cards = [card for card in hand if card.suit == led_suit]
-        if not valid_cards:
-            valid_cards = [card for card in hand if card.suit == trump_suit]
-
-        if not valid_cards:
-            valid_cards = hand
+            return min_rank_card(high_cards)
+        return min_rank_card(legal)
 
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        valid_cards = legal if legal is not None else follow_options(hand, led, trump)
         if trump_played:
-            return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return min_rank_card(valid_cards)
         else:
-            high_cards = [card for card in valid_cards if card.rank in "JQKA"]
+            high_cards = valid_cards & self.high_mask
             if high_cards:
-                return max(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return max_rank_card(high_cards)
             else:
-                return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return min_rank_card(valid_cards)
 
-    def bid(self, hand, current_bids):
-        num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
-        bid_value = max(1, num_high_cards // 4)
+    def bid_bits(self, hand, current_bids):
+        num_high_cards = (hand & self.high_mask).bit_count()
+        bid_value = max(self.bid_floor, num_high_cards // self.bid_divisor)
         return max(current_bids + [0]) + bid_value
 
-    def choose_trump_suit(self, hand):
-        suit_counts = {suit: 0 for suit in Deck.suits}
-        for card in hand:
-            suit_counts[card.suit] += 1
-        return max(suit_counts, key=suit_counts.get)
-
-
-def create_personalities(num_players):
-    personalities = [
-        ConservativePlayer(),
-        AggressivePlayer(),
-        BalancedPlayer(),
-        OpportunisticPlayer(),
-    ]
-    return personalities[:num_players]
+    def choose_trump_bits(self, hand):
+        return longest_suit(hand)
 
 
-def play_trick(leader, hands, trump_suit, trump_played, personalities):
-    played_cards = []
-    led_suit = None
-    for i, hand in enumerate(hands):
-        player = (leader + i) % len(hands)
-        personality = personalities[player]
+PERSONALITIES = {
+    cls.__name__: cls
+    for cls in (
+        ConservativePlayer,
+        AggressivePlayer,
+        BalancedPlayer,
+        OpportunisticPlayer,
+    )
+}
+DEFAULT_PERSONALITIES = tuple(PERSONALITIES)
+
+
+def create_personalities(num_players, names=DEFAULT_PERSONALITIES):
+    return [PERSONALITIES[name]() for name in names[:num_players]]
+
 
-        if led_suit is None:
-            led_card = personality.lead_card(hand, trump_suit, trump_played)
-            hand.remove(led_card)
-            played_cards.append((player, led_card))
-            print(f"Player {player + 1} leads {led_card}")
-            led_suit = led_card.suit
-            if led_card.suit == trump_suit:
-                trump_played = True
+class GameResult:
+    def __init__(
+        self, bids, highest_bidder, trump_suit, tricks_won, scores, plays=None
+    ):
+        self.bids = bids
+        self.highest_bidder = highest_bidder
+        self.highest_bid = bids[highest_bidder]
+        self.trump_suit = trump_suit
+        self.tricks_won = tricks_won
+        self.scores = scores
+        # Card ids in the order they were played, trick by trick.
+        self.plays = plays if plays is not None else []
+
+    def __repr__(self):
+        return (
+            f"GameResult(bids={self.bids}, highest_bidder={self.highest_bidder}, "
+            f"trump_suit={self.trump_suit!r}, tricks_won={self.tricks_won}, "
+            f"scores={self.scores})"
+        )
+
+
+class GameState:
+    # The play of a deal as one mutable object: apply(card) plays a card for
+    # the player to move and undo() takes the last one back, so a search can
+    # walk the game tree without copying hands. Each ply's card, and at each
+    # lead the leader and trump flag, go into lists sized for the whole deal
+    # up front, and the trick in progress is the tail of those plays, with
+    # its cards also kept as a mask so resolving it allocates nothing.
+    def __init__(self, hands, trump, leader, trump_played=False, rules=CLASSIC):
+        self.hands = list(hands)
+        self.num_players = len(self.hands)
+        self.rules = rules
+        self.trump = trump
+        self.leader = leader
+        self.trump_played = trump_played
+        self.tricks_won = [0] * self.num_players
+        self.trick_size = 0
+        self.trick_mask = 0
+        self.ply = 0
+        size = sum(hand.bit_count() for hand in self.hands)
+        self.plays = [0] * size
+        self._leaders = [0] * size
+        self._trump_played = [False] * size
+
+    def to_move(self):
+        return (self.leader + self.trick_size) % self.num_players
+
+    def led(self):
+        if not self.trick_size:
+            return None
+        return self.plays[self.ply - self.trick_size] // 13
+
+    def trick(self):
+        # The trick in progress as (player, card) pairs.
+        start = self.ply - self.trick_size
+        return [
+            ((self.leader + i) % self.num_players, self.plays[start + i])
+            for i in range(self.trick_size)
+        ]
+
+    def winning_card(self):
+        # The card currently winning the trick in progress, or None.
+        if not self.trick_size:
+            return None
+        start = self.ply - self.trick_size
+        winning = self.plays[start]
+        for i in range(start + 1, self.ply):
+            if beats(self.plays[i], winning, self.trump):
+                winning = self.plays[i]
+        return winning
+
+    def legal_moves(self):
+        return self.rules.legal_moves(
+            self.hands[self.to_move()],
+            self.led(),
+            self.winning_card(),
+            self.trump,
+            self.trump_played,
+        )
+
+    def apply(self, card):
+        # Plays `card` for the player to move. Returns the trick winner when
+        # the card completes a trick and None otherwise.
+        ply = self.ply
+        leader = self.leader
+        num_players = self.num_players
+        trick_size = self.trick_size + 1
+        self.hands[(leader + trick_size - 1) % num_players] &= ~(1 << card)
+        self.plays[ply] = card
+        self.ply = ply + 1
+        trick_mask = self.trick_mask | 1 << card
+        # Leading trump breaks it for the rest of the trick; trumping in only
+        # counts once the trick is over. Only a lead changes the leader or
+        # the trump flag before the trick ends, so only leads record them.
+        if trick_size < num_players:
+            self.trick_size = trick_size
+            self.trick_mask = trick_mask
+            if trick_size == 1:
+                self._leaders[ply] = leader
+                self._trump_played[ply] = self.trump_played
+                if card // 13 == self.trump:
+                    self.trump_played = True
+            return None
+
+        start = ply + 1 - num_players
+        trumps = trick_mask & SUIT_MASKS[self.trump]
+        winning = trumps or trick_mask & SUIT_MASKS[self.plays[start] // 13]
+        offset = self.plays.index(winning.bit_length() - 1, start, ply + 1) - start
+        winner = (leader + offset) % num_players
+        self.tricks_won[winner] += 1
+        if trumps:
+            self.trump_played = True
+        self.leader = winner
+        self.trick_size = 0
+        self.trick_mask = 0
+        return winner
+
+    def undo(self):
+        if not self.ply:
+            raise IndexError("no card to undo")
+        ply = self.ply - 1
+        card = self.plays[ply]
+        trick_size = self.trick_size
+        if not trick_size:
+            # Back into a finished trick: the flag returns to what it was
+            # after the lead.
+            trick_size = self.num_players
+            start = ply + 1 - trick_size
+            self.tricks_won[self.leader] -= 1
+            self.leader = self._leaders[start]
+            self.trump_played = (
+                self._trump_played[start] or self.plays[start] // 13 == self.trump
+            )
+            trick_mask = 0
+            for i in range(start, ply + 1):
+                trick_mask |= 1 << self.plays[i]
         else:
-            follow_card = personality.follow_card(
-                hand, led_suit, trump_suit, trump_played
+            trick_mask = self.trick_mask
+            if trick_size == 1:
+                self.trump_played = self._trump_played[ply]
+        self.trick_mask = trick_mask & ~(1 << card)
+        trick_size -= 1
+        self.trick_size = trick_size
+        self.ply = ply
+        self.hands[(self.leader + trick_size) % self.num_players] |= 1 << card
+        return card
+
+    def is_over(self):
+        # Play stops once a player is out of cards between tricks; with 3
+        # players the first seat keeps the one card left over.
+        return not self.trick_size and not all(self.hands)
+
+
+def _illegal(player, card):
+    return IllegalMove(f"Player {player + 1} may not play {CARDS[card]}")
+
+
+def play_state_trick(state, personalities, log=None, observers=()):
+    # Plays one trick on a GameState and returns the winner. Every move is
+    # checked against the state's rules, and personalities are handed the
+    # legal set so they need not work it out again. The winning card is
+    # only followed when the rules depend on it.
+    hands = state.hands
+    trump = state.trump
+    leader = state.leader
+    num_players = state.num_players
+    legal_moves = state.rules.legal_moves
+    overtake = state.rules.must_overtake
+    led = None
+    winning = None
+    for i in range(num_players):
+        player = (leader + i) % num_players
+        personality = personalities[player]
+        trump_played = state.trump_played
+        legal = legal_moves(hands[player], led, winning, trump, trump_played)
+        if i:
+            card = personality.follow_bits(
+                hands[player], led, trump, trump_played, legal
             )
-            hand.remove(follow_card)
-            played_cards.append((player, follow_card))
-            print(f"Player {player + 1} plays {follow_card}")
-
-    return played_cards
-
-
-def find_trick_winner(played_cards, trump_suit):
-    winning_card = played_cards[0][1]
-    winner = played_cards[0][0]
-    for player, card in played_cards[1:]:
-        if card.suit == trump_suit and winning_card.suit != trump_suit:
-            winning_card = card
-            winner = player
-        elif card.suit == winning_card.suit and Deck.ranks.index(
-            card.rank
-        ) > Deck.ranks.index(winning_card.rank):
-            winning_card = card
-            winner = player
-
+            if overtake and beats(card, winning, trump):
+                winning = card
+        else:
+            card = personality.lead_bits(hands[player], trump, trump_played, legal)
+            led = card // 13
+            winning = card
+        if not legal >> card & 1:
+            raise _illegal(player, card)
+        winner = state.apply(card)
+        for observer in observers:
+            observer.observe_card(player, card)
+        if log is not None:
+            log(f"Player {player + 1} {'plays' if i else 'leads'} {CARDS[card]}")
     return winner
 
 
-def save_results_to_file(results):
-    with open("results.txt", "a") as f:
-        f.write(", ".join(str(points) for points in results) + "\n")
+def play_trick(
+    leader,
+    hands,
+    trump,
+    trump_played,
+    personalities,
+    log=None,
+    observers=(),
+    rules=CLASSIC,
+):
+    # One trick played through a GameState. `hands` is updated in place and
+    # the (player, card) pairs are returned in the order they were played.
+    state = GameState(hands, trump, leader, trump_played, rules)
+    play_state_trick(state, personalities, log, observers)
+    hands[:] = state.hands
+    return [
+        ((leader + i) % state.num_players, card)
+        for i, card in enumerate(state.plays[: state.ply])
+    ]
+
+
+def find_trick_winner(played_cards, trump):
+    trick = 0
+    for _, card in played_cards:
+        trick |= 1 << card
+    winning = trick & SUIT_MASKS[trump] or trick & SUIT_MASKS[played_cards[0][1] // 13]
+    winning_card = highest_card(winning)
+    for player, card in played_cards:
+        if card == winning_card:
+            return player
+
+
+def play_hand(
+    leader, hands, trump, personalities, trump_played=False, rules=CLASSIC
+):
+    # Plays out every remaining trick without logging and returns the tricks
+    # each player took; `hands` is updated in place.
+    state = GameState(hands, trump, leader, trump_played, rules)
+    while not state.is_over():
+        play_state_trick(state, personalities)
+    hands[:] = state.hands
+    return state.tricks_won
+
+
+def score_game(tricks_won, highest_bidder, highest_bid):
+    scores = tricks_won.copy()
+    if tricks_won[highest_bidder] < highest_bid:
+        scores[highest_bidder] = -highest_bid
+
+    # Update scores for players who didn't win any tricks
+    for i, tricks in enumerate(tricks_won):
+        if tricks == 0:
+            scores[i] = -4
+
+    return scores
+
+
+def save_results_to_file(results, file_name=RESULTS_FILE):
+    with ResultWriter(file_name, len(results)) as writer:
+        writer.write(results)
 
 
-def bidding_phase(hands, personalities):
+def run_bidding(hands, personalities, log=None, rng=random):
     bids = [0] * len(hands)
     tied_players = list(range(len(hands)))
     tie_counter = 0
@@ -253,14 +682,14 @@ def bidding_phase(hands, personalities):
         new_bids = []
 
         for i in tied_players:
-            print(
-                f"Player {i + 1}, your hand: {sorted(hands[i], key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)))}"
-            )
-            bid = personalities[i].bid(
+            if log is not None:
+                log(f"Player {i + 1}, your hand: {hand_cards(hands[i])}")
+            bid = personalities[i].bid_bits(
                 hands[i], [bids[j] for j in tied_players if j != i]
             )
             new_bids.append((i, bid))
-            print(f"Player {i + 1} bids {bid}")
+            if log is not None:
+                log(f"Player {i + 1} bids {bid}")
 
         highest_bid = max(new_bids, key=lambda x: x[1])
         new_tied_players = [i for i, bid in new_bids if bid == highest_bid[1]]
@@ -271,7 +700,7 @@ def bidding_phase(hands, personalities):
             tie_counter = 0
 
         if tie_counter >= 3:
-            forced_bidder = random.choice(new_tied_players)
+            forced_bidder = rng.choice(new_tied_players)
             bids[forced_bidder] += 1
             tied_players = [forced_bidder]
             break
@@ -282,64 +711,95 @@ def bidding_phase(hands, personalities):
             bids[i] = bid
 
     highest_bidder = tied_players[0]
-    trump_suit = personalities[highest_bidder].choose_trump_suit(hands[highest_bidder])
+    trump = personalities[highest_bidder].choose_trump_bits(hands[highest_bidder])
 
-    return highest_bidder, bids[highest_bidder], trump_suit
+    return bids, highest_bidder, trump
 
 
-def play_game(num_players=4):
-    deck = Deck()
-    hands = deck.deal(num_players)
-    tricks_won = [0] * num_players
-    scores = [0] * num_players
-    trump_played = False
-    personalities = create_personalities(num_players)
+def bidding_phase(hands, personalities, log=print, rng=random):
+    bids, highest_bidder, trump = run_bidding(hands, personalities, log, rng)
+    return highest_bidder, bids[highest_bidder], trump
 
-    highest_bidder, highest_bid, trump_suit = bidding_phase(hands, personalities)
-    print(
-        f"\nPlayer {highest_bidder + 1} has the highest bid of {highest_bid} and leads the first trick"
-    )
-    print(f"Trump suit is {trump_suit}\n")
 
-    leader = highest_bidder
-    for i in range(len(deck.cards) // num_players):
-        print(f"Trick {i + 1}:")
-        played_cards = play_trick(
-            leader, hands, trump_suit, trump_played, personalities
-        )
-        winner = find_trick_winner(played_cards, trump_suit)
-        tricks_won[winner] += 1
-        if winner != leader:
-            leader = winner
-        if not trump_played:
-            trump_played = any(card.suit == trump_suit for _, card in played_cards)
-        print(f"Player {winner + 1} wins trick {i + 1}\n")
+def simulate_game(
+    num_players=4, personalities=None, log=None, rng=random, deck=None, rules=CLASSIC
+):
+    if deck is None:
+        deck = Deck(rng)
+    hands = deck.deal_masks(num_players)
+    if personalities is None:
+        personalities = create_personalities(num_players)
 
-    scores = tricks_won.copy()
-    if tricks_won[highest_bidder] < highest_bid:
-        scores[highest_bidder] = -highest_bid
-        print(
-            f"Player {highest_bidder + 1} did not win {highest_bid} tricks, their score is set to {-highest_bid}"
+    bids, highest_bidder, trump = run_bidding(hands, personalities, log, rng)
+    highest_bid = bids[highest_bidder]
+    if log is not None:
+        log(
+            f"\nPlayer {highest_bidder + 1} has the highest bid of {highest_bid} and leads the first trick"
         )
+        log(f"Trump suit is {SUITS[trump]}\n")
 
-    # Update scores for players who didn't win any tricks
-    for i, tricks in enumerate(tricks_won):
-        if tricks == 0:
-            scores[i] = -4
-            print(f"Player {i + 1} did not win any tricks, their score is set to -4")
+    observers = [p for p in personalities if p.observes_play]
+    for seat, personality in enumerate(personalities):
+        if personality.observes_play:
+            personality.start_play(seat, bids, highest_bidder, trump)
 
-    print("Results:")
-    print("--------")
-    total_tricks_won = 0
-    for i, (score, tricks) in enumerate(zip(scores, tricks_won)):
-        print(f"Player {i + 1}:")
-        print(f"  Score: {score}")
-        print(f"  Tricks won: {tricks}")
-        total_tricks_won += tricks
-
-    print(f"\nTotal tricks won: {total_tricks_won}")
-
-    save_results_to_file(scores)
+    state = GameState(hands, trump, highest_bidder, rules=rules)
+    for i in range(len(deck.cards) // num_players):
+        if log is not None:
+            log(f"Trick {i + 1}:")
+        winner = play_state_trick(state, personalities, log, observers)
+        if log is not None:
+            log(f"Player {winner + 1} wins trick {i + 1}\n")
+
+    tricks_won = state.tricks_won
+    plays = state.plays[: state.ply]
+    scores = score_game(tricks_won, highest_bidder, highest_bid)
+    if log is not None:
+        if tricks_won[highest_bidder] < highest_bid:
+            log(
+                f"Player {highest_bidder + 1} did not win {highest_bid} tricks, their score is set to {-highest_bid}"
+            )
+        for i, tricks in enumerate(tricks_won):
+            if tricks == 0:
+                log(f"Player {i + 1} did not win any tricks, their score is set to -4")
+
+    return GameResult(bids, highest_bidder, SUITS[trump], tricks_won, scores, plays)
+
+
+def play_game(
+    num_players=4,
+    personalities=None,
+    log=print,
+    save=True,
+    rng=random,
+    writer=None,
+    recorder=None,
+    seed=None,
+    deck=None,
+    rules=CLASSIC,
+):
+    if seed is not None:
+        rng = random.Random(seed)
+    result = simulate_game(num_players, personalities, log, rng, deck, rules)
+
+    if log is not None:
+        log("Results:")
+        log("--------")
+        for i, (score, tricks) in enumerate(zip(result.scores, result.tricks_won)):
+            log(f"Player {i + 1}:")
+            log(f"  Score: {score}")
+            log(f"  Tricks won: {tricks}")
+
+        log(f"\nTotal tricks won: {sum(result.tricks_won)}")
+
+    if writer is not None:
+        writer.write(result.scores)
+    elif save:
+        save_results_to_file(result.scores)
+    if recorder is not None:
+        recorder.write(result, seed)
+
+    return result
 
 
 if __name__ == "__main__":
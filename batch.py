@@ -0,0 +1,253 @@
+import numpy as np
+
+from batak import (
+    SUIT_MASKS,
+    AggressivePlayer,
+    BalancedPlayer,
+    ConservativePlayer,
+    OpportunisticPlayer,
+    create_personalities,
+)
+
+NUM_PLAYERS = 4
+NUM_TRICKS = 52 // NUM_PLAYERS
+
+# Personality kinds understood by the batch engine, indexed by kind id. Their
+# high_mask, bid_divisor and bid_floor attributes are read from the classes.
+KINDS = [ConservativePlayer, AggressivePlayer, BalancedPlayer, OpportunisticPlayer]
+
+# Hands fit in 52 bits, so signed 64-bit lanes hold them and keep `m & -m`
+# available for isolating the lowest card.
+_SUIT_MASKS = np.array(SUIT_MASKS, dtype=np.int64)
+_RANK_COLUMN = 1 | 1 << 13 | 1 << 26 | 1 << 39
+_CARDS = np.arange(52, dtype=np.int64)
+_CARD_BITS = np.left_shift(1, _CARDS)
+
+
+class BatchResult:
+    def __init__(self, bids, highest_bidder, trump, tricks_won, scores):
+        self.bids = bids
+        self.highest_bidder = highest_bidder
+        self.highest_bid = bids[np.arange(len(bids)), highest_bidder]
+        self.trump = trump
+        self.tricks_won = tricks_won
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.scores)
+
+
+def deal_batch(n, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    decks = np.broadcast_to(np.arange(52, dtype=np.int8), (n, 52))
+    return rng.permuted(decks, axis=1)
+
+
+def _highest(masks):
+    # Hands never use bit 52 or above, so the float conversion is exact.
+    return np.frexp(masks.astype(np.float64))[1] - 1
+
+
+def _lowest(masks):
+    return _highest(masks & -masks)
+
+
+def _fold(masks):
+    return (masks | masks >> 13 | masks >> 26 | masks >> 39) & 0x1FFF
+
+
+def _min_rank_card(masks):
+    rank = np.maximum(_lowest(_fold(masks)), 0)
+    return rank + _lowest((masks >> rank) & _RANK_COLUMN)
+
+
+def _max_rank_card(masks):
+    rank = np.maximum(_highest(_fold(masks)), 0)
+    return rank + _lowest((masks >> rank) & _RANK_COLUMN)
+
+
+def _follow_options(hands, led, trump_masks):
+    valid = hands & _SUIT_MASKS[led]
+    valid = np.where(valid != 0, valid, hands & trump_masks)
+    return np.where(valid != 0, valid, hands)
+
+
+def _conservative_lead(hands, trump_masks, trump_played):
+    non_trump = hands & ~trump_masks
+    return _lowest(np.where(~trump_played & (non_trump != 0), non_trump, hands))
+
+
+def _conservative_follow(hands, led, trump_masks, trump_played):
+    return _min_rank_card(_follow_options(hands, led, trump_masks))
+
+
+def _aggressive_lead(hands, trump_masks, trump_played):
+    non_trump = hands & ~trump_masks
+    return _max_rank_card(
+        np.where(~trump_played & (non_trump != 0), non_trump, hands)
+    )
+
+
+def _aggressive_follow(hands, led, trump_masks, trump_played):
+    valid = _follow_options(hands, led, trump_masks)
+    high = valid & AggressivePlayer.high_mask
+    valid = np.where(high != 0, high, valid)
+    return np.where(trump_played, _min_rank_card(valid), _max_rank_card(valid))
+
+
+def _balanced_lead(hands, trump_masks, trump_played):
+    allowed = np.where(trump_played, hands, hands & ~trump_masks)
+    high = allowed & BalancedPlayer.high_mask
+    low = allowed & ~BalancedPlayer.high_mask
+    return np.where(
+        high != 0,
+        _max_rank_card(high),
+        np.where(low != 0, _min_rank_card(low), _max_rank_card(hands)),
+    )
+
+
+def _balanced_follow(hands, led, trump_masks, trump_played):
+    valid = _follow_options(hands, led, trump_masks)
+    return np.where(trump_played, _min_rank_card(valid), _max_rank_card(valid))
+
+
+def _opportunistic_lead(hands, trump_masks, trump_played):
+    non_trump = hands & ~trump_masks
+    legal = np.where(~trump_played & (non_trump != 0), non_trump, hands)
+    high = legal & OpportunisticPlayer.high_mask
+    high = np.where(trump_played, high, high & ~trump_masks)
+    return np.where(high != 0, _min_rank_card(high), _min_rank_card(legal))
+
+
+def _opportunistic_follow(hands, led, trump_masks, trump_played):
+    valid = _follow_options(hands, led, trump_masks)
+    high = valid & OpportunisticPlayer.high_mask
+    lowest_valid = _min_rank_card(valid)
+    return np.where(
+        trump_played,
+        lowest_valid,
+        np.where(high != 0, _max_rank_card(high), lowest_valid),
+    )
+
+
+# Vectorized counterparts of each personality's lead_bits/follow_bits, indexed
+# by kind id.
+LEAD_RULES = [
+    _conservative_lead,
+    _aggressive_lead,
+    _balanced_lead,
+    _opportunistic_lead,
+]
+FOLLOW_RULES = [
+    _conservative_follow,
+    _aggressive_follow,
+    _balanced_follow,
+    _opportunistic_follow,
+]
+
+
+def _bidding(holds, seat_kinds, tie_breaks, rng):
+    n = len(holds)
+    rows = np.arange(n)
+    by_suit = holds.reshape(n, NUM_PLAYERS, 4, 13)
+    kinds = [KINDS[kind] for kind in seat_kinds]
+    high_cards = np.array([(kind.high_mask >> _CARDS) & 1 for kind in kinds])
+    high_counts = (holds & high_cards.astype(bool)).sum(axis=2)
+    divisors = np.array([kind.bid_divisor for kind in kinds])
+    floors = np.array([kind.bid_floor for kind in kinds])
+    values = np.maximum(high_counts // divisors, floors)
+
+    # With the built-in bid rule a shared top bid keeps tying until the third
+    # round, when one of the tied players is forced to its second-round bid
+    # (twice the opening bid) plus one.
+    top = values.max(axis=1)
+    tied = values == top[:, None]
+    num_tied = tied.sum(axis=1)
+    forced = num_tied > 1
+
+    # tie_breaks[i] is the position, in seat order, of the forced bidder among
+    # the tied players, i.e. the index random.choice picks in run_bidding.
+    if tie_breaks is None:
+        tie_breaks = rng.integers(0, num_tied)
+    tie_breaks = np.minimum(tie_breaks, num_tied - 1)
+    order = np.cumsum(tied, axis=1) - 1
+    highest_bidder = np.argmax(tied & (order == tie_breaks[:, None]), axis=1)
+
+    bids = np.where(forced[:, None] & tied, 2 * top[:, None], values)
+    bids[rows[forced], highest_bidder[forced]] += 1
+
+    trump = np.argmax(by_suit.sum(axis=3)[rows, highest_bidder], axis=1)
+    return bids, highest_bidder, trump
+
+
+def simulate_batch(deals, personalities=None, tie_breaks=None, rng=None):
+    deals = np.asarray(deals)
+    n = len(deals)
+    if personalities is None:
+        personalities = create_personalities(NUM_PLAYERS)
+    if len(personalities) != NUM_PLAYERS:
+        raise ValueError(f"batch games need exactly {NUM_PLAYERS} players")
+    seat_kinds = []
+    for personality in personalities:
+        if type(personality) not in KINDS:
+            raise ValueError(
+                f"{type(personality).__name__} is not supported by the batch engine"
+            )
+        seat_kinds.append(KINDS.index(type(personality)))
+    seat_kinds = np.array(seat_kinds)
+    if rng is None:
+        rng = np.random.default_rng()
+    if tie_breaks is not None:
+        tie_breaks = np.asarray(tie_breaks)
+
+    rows = np.arange(n)
+    holds = np.zeros((n, NUM_PLAYERS, 52), dtype=bool)
+    for player in range(NUM_PLAYERS):
+        holds[rows[:, None], player, deals[:, player::NUM_PLAYERS]] = True
+    # Deck.deal gives player p every fourth card starting at p.
+    dealt = _CARD_BITS[deals].reshape(n, 13, NUM_PLAYERS)
+    hands = np.ascontiguousarray(np.bitwise_or.reduce(dealt, axis=1).T)
+
+    bids, highest_bidder, trump = _bidding(holds, seat_kinds, tie_breaks, rng)
+    trump_masks = _SUIT_MASKS[trump]
+    trump_played = np.zeros(n, dtype=bool)
+    tricks_won = np.zeros((NUM_PLAYERS, n), dtype=np.int64)
+    leader = highest_bidder
+    cards = np.empty((NUM_PLAYERS, n), dtype=np.int64)
+
+    for _ in range(NUM_TRICKS):
+        led_cards = np.choose(
+            leader,
+            [
+                LEAD_RULES[kind](hands[seat], trump_masks, trump_played)
+                for seat, kind in enumerate(seat_kinds)
+            ],
+        )
+        led = led_cards // 13
+        # A trump lead counts as trump played for the rest of the trick.
+        following_trump_played = trump_played | (led == trump)
+        for seat, kind in enumerate(seat_kinds):
+            follow = FOLLOW_RULES[kind](
+                hands[seat], led, trump_masks, following_trump_played
+            )
+            cards[seat] = np.where(leader == seat, led_cards, follow)
+            hands[seat] &= ~_CARD_BITS[cards[seat]]
+
+        suits = cards // 13
+        is_trump = suits == trump
+        strength = np.where(
+            is_trump, cards % 13 + 13, np.where(suits == led, cards % 13, -1)
+        )
+        leader = np.argmax(strength, axis=0)
+        tricks_won[leader, rows] += 1
+        trump_played |= is_trump.any(axis=0)
+
+    tricks_won = np.ascontiguousarray(tricks_won.T)
+    scores = tricks_won.copy()
+    highest_bid = bids[rows, highest_bidder]
+    failed = tricks_won[rows, highest_bidder] < highest_bid
+    scores[rows[failed], highest_bidder[failed]] = -highest_bid[failed]
+    scores[tricks_won == 0] = -4
+
+    return BatchResult(bids, highest_bidder, trump, tricks_won, scores)
@@ -0,0 +1,297 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from batak import (
+    FULL_MASK,
+    SUITS,
+    Deck,
+    bidding_phase,
+    create_personalities,
+    find_trick_winner,
+    hand_cards,
+    play_game,
+    play_trick,
+    simulate_game,
+)
+from inference import CardInference, DealSampler, np
+from read_results_from_file import calculate_total_scores, read_results_from_file
+from results_store import ResultSet, ResultWriter
+
+BASELINE_FILE = "bench_baseline.json"
+SEED = 12345
+REPEAT = 5
+THRESHOLD = 0.1
+
+# Each benchmark is a setup function taking a seeded Random and a scratch
+# directory, removed once the run is over, and returning a callable plus the
+# number of operations one call performs. Setup work is not timed.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _deals(rng, count, num_players=4):
+    return [Deck(rng).deal_masks(num_players) for _ in range(count)]
+
+
+@benchmark("find_trick_winner")
+def _find_trick_winner(rng, directory):
+    tricks = []
+    for _ in range(2000):
+        cards = rng.sample(range(52), 4)
+        tricks.append((list(enumerate(cards)), rng.randrange(4)))
+
+    def run():
+        for trick, trump in tricks:
+            find_trick_winner(trick, trump)
+
+    return run, len(tricks)
+
+
+@benchmark("play_trick")
+def _play_trick(rng, directory):
+    deals = [(hands, rng.randrange(4), rng.randrange(4)) for hands in _deals(rng, 500)]
+    personalities = create_personalities(4)
+
+    def run():
+        for hands, leader, trump in deals:
+            play_trick(leader, list(hands), trump, False, personalities)
+
+    return run, len(deals)
+
+
+@benchmark("bidding_phase")
+def _bidding_phase(rng, directory):
+    deals = _deals(rng, 500)
+    personalities = create_personalities(4)
+
+    def run():
+        bidding_rng = random.Random(SEED)
+        for hands in deals:
+            bidding_phase(hands, personalities, log=None, rng=bidding_rng)
+
+    return run, len(deals)
+
+
+def _positions(rng, count):
+    positions = []
+    for hands in _deals(rng, count):
+        hand = hands[0]
+        positions.append((hand, hand_cards(hand), rng.randrange(4), rng.randrange(4)))
+    return positions
+
+
+def _personality_benchmarks(personality):
+    name = type(personality).__name__
+
+    @benchmark(f"{name}.lead_card")
+    def _lead_card(rng, directory):
+        positions = _positions(rng, 500)
+
+        def run():
+            for _, cards, _, trump in positions:
+                personality.lead_card(cards, SUITS[trump], False)
+
+        return run, len(positions)
+
+    @benchmark(f"{name}.follow_card")
+    def _follow_card(rng, directory):
+        positions = _positions(rng, 500)
+
+        def run():
+            for _, cards, led, trump in positions:
+                personality.follow_card(cards, SUITS[led], SUITS[trump], True)
+
+        return run, len(positions)
+
+    @benchmark(f"{name}.lead_bits")
+    def _lead_bits(rng, directory):
+        positions = _positions(rng, 500)
+
+        def run():
+            for hand, _, _, trump in positions:
+                personality.lead_bits(hand, trump, False)
+
+        return run, len(positions)
+
+    @benchmark(f"{name}.follow_bits")
+    def _follow_bits(rng, directory):
+        positions = _positions(rng, 500)
+
+        def run():
+            for hand, _, led, trump in positions:
+                personality.follow_bits(hand, led, trump, True)
+
+        return run, len(positions)
+
+
+for _personality in create_personalities(4):
+    _personality_benchmarks(_personality)
+
+
+@benchmark("play_game")
+def _play_game(rng, directory):
+    seeds = [rng.getrandbits(32) for _ in range(200)]
+
+    def run():
+        for seed in seeds:
+            play_game(log=None, save=False, seed=seed)
+
+    return run, len(seeds)
+
+
+def _sampler(rng):
+    # A sampler for a random seat partway through a seeded game.
+    cards = Deck(rng).cards
+    hands = Deck(cards=cards).deal_masks(4)
+    result = simulate_game(4, rng=rng, deck=Deck(cards=cards))
+    inference = CardInference(4, SUITS.index(result.trump_suit))
+    for card in result.plays[: rng.randrange(8, 40)]:
+        player = next(seat for seat, hand in enumerate(hands) if hand >> card & 1)
+        inference.observe(player, card)
+        hands[player] &= ~(1 << card)
+    seat = rng.randrange(4)
+    return DealSampler(
+        seat,
+        hands[seat],
+        FULL_MASK & ~hands[seat] & ~inference.played,
+        [hand.bit_count() for hand in hands],
+        inference.voids,
+    )
+
+
+@benchmark("DealSampler.sample")
+def _deal_sampler(rng, directory):
+    samplers = [_sampler(rng) for _ in range(20)]
+
+    def run():
+        sample_rng = random.Random(SEED)
+        for sampler in samplers:
+            sampler.sample_many(100, sample_rng)
+
+    return run, len(samplers) * 100
+
+
+if np is not None:
+
+    @benchmark("DealSampler.sample_array")
+    def _deal_sampler_array(rng, directory):
+        samplers = [_sampler(rng) for _ in range(20)]
+
+        def run():
+            for sampler in samplers:
+                sampler.sample_array(5000, SEED)
+
+        return run, len(samplers) * 5000
+
+
+def _result_rows(rng, count):
+    return [[rng.randint(-13, 13) for _ in range(4)] for _ in range(count)]
+
+
+@benchmark("read_results_from_file")
+def _read_results_text(rng, directory):
+    path = os.path.join(directory, "results.txt")
+    rows = _result_rows(rng, 100000)
+    with open(path, "w") as f:
+        f.writelines(", ".join(str(score) for score in row) + "\n" for row in rows)
+
+    def run():
+        calculate_total_scores(read_results_from_file(path))
+
+    return run, len(rows)
+
+
+@benchmark("ResultSet.totals")
+def _read_results_binary(rng, directory):
+    path = os.path.join(directory, "results.bin")
+    rows = _result_rows(rng, 1000000)
+    with ResultWriter(path) as writer:
+        writer.write_many(rows)
+
+    def run():
+        with ResultSet(path) as results:
+            results.totals()
+
+    return run, len(rows)
+
+
+def run_benchmarks(names=None, repeat=REPEAT, log=None):
+    # Operations per second for each benchmark, from the fastest of
+    # `repeat` timed calls.
+    rates = {}
+    for name, setup in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            function, ops = setup(random.Random(f"{SEED}:{name}"), directory)
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                function()
+                elapsed = time.perf_counter() - start
+                if best is None or elapsed < best:
+                    best = elapsed
+        rates[name] = ops / best
+        if log is not None:
+            log(f"{name}: {rates[name]:,.0f} ops/s")
+    return rates
+
+
+def save_baseline(rates, path=BASELINE_FILE):
+    with open(path, "w") as f:
+        json.dump(rates, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path=BASELINE_FILE):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare(rates, baseline, threshold=THRESHOLD):
+    # Benchmarks whose rate fell more than `threshold` below the baseline,
+    # as (name, baseline rate, current rate).
+    return [
+        (name, baseline[name], rate)
+        for name, rate in rates.items()
+        if name in baseline and rate < baseline[name] * (1 - threshold)
+    ]
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    path = sys.argv[2] if len(sys.argv) > 2 else BASELINE_FILE
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else THRESHOLD
+
+    if command == "run":
+        save_baseline(run_benchmarks(log=print), path)
+        print(f"Saved baseline to {path}")
+    elif command == "compare":
+        baseline = load_baseline(path)
+        rates = run_benchmarks(log=print)
+        regressions = compare(rates, baseline, threshold)
+        for name, before, after in regressions:
+            print(
+                f"REGRESSION {name}: {after:,.0f} ops/s, "
+                f"{1 - after / before:.0%} below baseline {before:,.0f}"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {threshold:.0%}")
+    else:
+        print("usage: python benchmark.py [run|compare] [baseline] [threshold]")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from multiprocessing import Pool
+
+from batak import SUIT_MASKS, BalancedPlayer, Deck, play_hand
+from tournament import deal_rng
+
+NUM_PLAYERS = 4
+ORACLE_FILE = "bid_oracle.bin"
+
+# Header: magic, format version, number of fine cells, number of coarse cells.
+HEADER = struct.Struct("<4sHxxII")
+MAGIC = b"BKBO"
+VERSION = 1
+
+# Cards below these ranks are treated as interchangeable: a trump suit is
+# described by its length and which of A, K, Q it holds, a side suit by its
+# length (capped) and which of A, K it holds.
+TRUMP_HONORS = 3
+SIDE_HONORS = 2
+SIDE_LENGTH_CAP = 7
+TRUMP_PATTERNS = (1 << TRUMP_HONORS) * 14
+SIDE_PATTERNS = (1 << SIDE_HONORS) * (SIDE_LENGTH_CAP + 1)
+SIDE_TRIPLES = SIDE_PATTERNS * (SIDE_PATTERNS + 1) * (SIDE_PATTERNS + 2) // 6
+FINE_CELLS = TRUMP_PATTERNS * SIDE_TRIPLES
+
+# Sparse fine cells fall back to a coarse cell keyed on trump length, trump
+# honors and the number of side aces and kings.
+COARSE_CELLS = TRUMP_PATTERNS * 4 * 4
+MIN_SAMPLES = 8
+
+
+def _suit_pattern(hand, suit, honors, length_cap):
+    cards = hand >> (13 * suit) & 0x1FFF
+    return (cards >> (13 - honors)) * (length_cap + 1) + min(
+        cards.bit_count(), length_cap
+    )
+
+
+def hand_key(hand, trump):
+    # Side suits are interchangeable, so their patterns are sorted and the
+    # triple is indexed with the combinatorial number system.
+    trump_pattern = _suit_pattern(hand, trump, TRUMP_HONORS, 13)
+    a, b, c = sorted(
+        _suit_pattern(hand, suit, SIDE_HONORS, SIDE_LENGTH_CAP)
+        for suit in range(len(SUIT_MASKS))
+        if suit != trump
+    )
+    triple = c * (c + 1) * (c + 2) // 6 + b * (b + 1) // 2 + a
+    return trump_pattern * SIDE_TRIPLES + triple
+
+
+def coarse_key(hand, trump):
+    trump_pattern = _suit_pattern(hand, trump, TRUMP_HONORS, 13)
+    side = hand & ~SUIT_MASKS[trump]
+    aces = (side & (1 << 12 | 1 << 25 | 1 << 38 | 1 << 51)).bit_count()
+    kings = (side & (1 << 11 | 1 << 24 | 1 << 37 | 1 << 50)).bit_count()
+    return (trump_pattern * 4 + aces) * 4 + kings
+
+
+def sample_deals(master_seed, start, stop):
+    # Each deal is played out once per declarer seat and trump suit, with
+    # every seat using the playout personality.
+    counts = array("I", bytes(4 * (FINE_CELLS + COARSE_CELLS)))
+    totals = array("I", bytes(4 * (FINE_CELLS + COARSE_CELLS)))
+    policies = [BalancedPlayer()] * NUM_PLAYERS
+    for deal_index in range(start, stop):
+        hands = Deck(deal_rng(master_seed, deal_index)).deal_masks(NUM_PLAYERS)
+        for declarer, hand in enumerate(hands):
+            for trump in range(len(SUIT_MASKS)):
+                tricks = play_hand(declarer, list(hands), trump, policies)[declarer]
+                for cell in (
+                    hand_key(hand, trump),
+                    FINE_CELLS + coarse_key(hand, trump),
+                ):
+                    counts[cell] += 1
+                    totals[cell] += tricks
+    return counts, totals
+
+
+def _sample_chunk(args):
+    return sample_deals(*args)
+
+
+def build_oracle(num_deals, master_seed=0, workers=None, path=ORACLE_FILE):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    num_chunks = max(1, min(num_deals, workers * 4))
+    bounds = [num_deals * i // num_chunks for i in range(num_chunks + 1)]
+    chunks = [(master_seed, start, stop) for start, stop in zip(bounds, bounds[1:])]
+
+    counts = array("I", bytes(4 * (FINE_CELLS + COARSE_CELLS)))
+    totals = array("I", bytes(4 * (FINE_CELLS + COARSE_CELLS)))
+    with Pool(workers) as pool:
+        for chunk_counts, chunk_totals in pool.imap_unordered(_sample_chunk, chunks):
+            for cell, count in enumerate(chunk_counts):
+                if count:
+                    counts[cell] += count
+                    totals[cell] += chunk_totals[cell]
+
+    # Records are stored interleaved as (count, total) pairs so a lookup
+    # touches a single 8-byte slot.
+    records = array("I", bytes(8 * (FINE_CELLS + COARSE_CELLS)))
+    records[0::2] = counts
+    records[1::2] = totals
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FINE_CELLS, COARSE_CELLS))
+        records.tofile(f)
+
+
+class BidOracle:
+    def __init__(self, path=ORACLE_FILE):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, fine_cells, coarse_cells = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} bid oracle")
+        if (fine_cells, coarse_cells) != (FINE_CELLS, COARSE_CELLS):
+            raise ValueError(f"{path} was built with a different hand encoding")
+        self._records = memoryview(self._map)[HEADER.size :].cast("I")
+
+    def expected_tricks(self, hand, trump):
+        cell = 2 * hand_key(hand, trump)
+        count = self._records[cell]
+        if count < MIN_SAMPLES:
+            cell = 2 * (FINE_CELLS + coarse_key(hand, trump))
+            count = self._records[cell]
+            if not count:
+                return 0.0
+        return self._records[cell + 1] / count
+
+    def close(self):
+        self._records.release()
+        self._map.close()
+
+
+class OraclePlayer(BalancedPlayer):
+    def __init__(self, oracle):
+        self.oracle = oracle
+
+    def _best_contract(self, hand):
+        return max(
+            (self.oracle.expected_tricks(hand, trump), -trump)
+            for trump in range(len(SUIT_MASKS))
+        )
+
+    def bid_bits(self, hand, current_bids):
+        expected, _ = self._best_contract(hand)
+        return max(1, int(expected))
+
+    def choose_trump_bits(self, hand):
+        _, trump = self._best_contract(hand)
+        return -trump
+
+
+def main():
+    num_deals = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    master_seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    build_oracle(num_deals, master_seed, workers)
+    print(f"Wrote {ORACLE_FILE} from {num_deals} deals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import random
+from collections import OrderedDict
+
+from batak import CLASSIC, beats, find_trick_winner
+from montecarlo import TrackingPersonality
+from solver import card_list, distinct_moves
+
+MAX_CARDS = 2
+SAMPLES = 3
+CACHE_SIZE = 1 << 16
+
+
+class EndgameCache:
+    # Bounded LRU of solved positions, shared by every search that uses it.
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+def _compress(hands):
+    # Canonical form of a trick-start position: within each suit the cards
+    # still out are renumbered from the bottom, since only their order
+    # matters once the higher and lower cards between them are gone.
+    remaining = 0
+    for hand in hands:
+        remaining |= hand
+    compressed = [0] * len(hands)
+    for suit in range(4):
+        bits = (remaining >> (suit * 13)) & 0x1FFF
+        position = suit * 13
+        while bits:
+            low = bits & -bits
+            card = suit * 13 + low.bit_length() - 1
+            for seat, hand in enumerate(hands):
+                if hand >> card & 1:
+                    compressed[seat] |= 1 << position
+                    break
+            position += 1
+            bits ^= low
+    return tuple(compressed)
+
+
+class EndgameSolver:
+    # Exact minimax over fully known hands under `rules`: `player` maximizes
+    # the tricks it takes from here on and every other seat minimizes them.
+    # Positions at the start of a trick are cached under their canonical
+    # form.
+    def __init__(self, trump, player, cache=None, rules=CLASSIC):
+        self.trump = trump
+        self.player = player
+        self.cache = cache if cache is not None else EndgameCache()
+        self.rules = rules
+        self.nodes = 0
+
+    def best_move(self, hands, leader, trick, trump_played):
+        # The card `player`, whose turn it is, should play given the cards
+        # already played to the current trick; ties go to the lowest card.
+        values = self.move_values(hands, leader, trick, trump_played)
+        best_value = max(values.values())
+        return min(card for card, value in values.items() if value == best_value)
+
+    def move_values(self, hands, leader, trick, trump_played):
+        # Exact tricks still to come for `player` after each distinct move.
+        hands = list(hands)
+        trick = tuple(trick)
+        seat = self.player
+        hand = hands[seat]
+        tricks_left = hand.bit_count()
+        values = {}
+        for card in card_list(self._moves(hands, seat, trick, trump_played)):
+            hands[seat] = hand & ~(1 << card)
+            values[card] = self._search(
+                hands, leader, trick + (card,), trump_played, -1, tricks_left + 1
+            )
+        hands[seat] = hand
+        return values
+
+    def _moves(self, hands, seat, trick, trump_played):
+        remaining = 0
+        for hand in hands:
+            remaining |= hand
+        for card in trick:
+            remaining |= 1 << card
+        led = winning = None
+        for card in trick:
+            if winning is None:
+                led, winning = card // 13, card
+            elif beats(card, winning, self.trump):
+                winning = card
+        moves = self.rules.legal_moves(
+            hands[seat], led, winning, self.trump, trump_played
+        )
+        return distinct_moves(moves, remaining)
+
+    def _trick_start(self, hands, leader, trump_played):
+        key = (
+            self.rules,
+            self.trump,
+            self.player,
+            leader,
+            trump_played,
+            _compress(hands),
+        )
+        value = self.cache.get(key)
+        if value is None:
+            tricks_left = hands[leader].bit_count()
+            value = self._search(hands, leader, (), trump_played, -1, tricks_left + 1)
+            self.cache.put(key, value)
+        return value
+
+    def _search(self, hands, leader, trick, trump_played, alpha, beta):
+        # Alpha-beta within a trick; every trick start is solved exactly and
+        # cached, so cached values never depend on the window.
+        self.nodes += 1
+        num_players = len(hands)
+        trump = self.trump
+        if len(trick) == num_players:
+            played = [
+                ((leader + i) % num_players, card) for i, card in enumerate(trick)
+            ]
+            winner = find_trick_winner(played, trump)
+            won = int(winner == self.player)
+            if not trump_played:
+                trump_played = any(card // 13 == trump for card in trick)
+            if not hands[winner]:
+                return won
+            return won + self._trick_start(hands, winner, trump_played)
+
+        seat = (leader + len(trick)) % num_players
+        hand = hands[seat]
+        maximizing = seat == self.player
+        best = -1 if maximizing else hand.bit_count() + 1
+        for card in card_list(self._moves(hands, seat, trick, trump_played)):
+            hands[seat] = hand & ~(1 << card)
+            value = self._search(
+                hands, leader, trick + (card,), trump_played, alpha, beta
+            )
+            if maximizing:
+                if value > best:
+                    best = value
+                    alpha = max(alpha, value)
+            elif value < best:
+                best = value
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        hands[seat] = hand
+        return best
+
+
+class EndgamePlayer(TrackingPersonality):
+    # Plays like `base` until its hand is down to `max_cards`, then picks
+    # the card that takes the most tricks in exact endgame search, summed
+    # over `samples` deals of the cards it has not seen. When the unseen
+    # cards can only lie one way a single deal is solved. `max_cards` trades
+    # strength for speed: with the default of 2 a game with one such seat
+    # runs at about a third of the speed of one without, and with 3 at an
+    # eighth, for a somewhat better score.
+    def __init__(
+        self,
+        base,
+        max_cards=MAX_CARDS,
+        samples=SAMPLES,
+        cache=None,
+        seed=None,
+        rules=CLASSIC,
+    ):
+        self.base = base
+        self.max_cards = max_cards
+        self.samples = samples
+        self.cache = cache if cache is not None else EndgameCache()
+        self.rng = random.Random(seed)
+        self.rules = rules
+
+    def start_play(self, seat, bids, highest_bidder, trump):
+        super().start_play(seat, bids, highest_bidder, trump)
+        if self.base.observes_play:
+            self.base.start_play(seat, bids, highest_bidder, trump)
+
+    def observe_card(self, player, card):
+        super().observe_card(player, card)
+        if self.base.observes_play:
+            self.base.observe_card(player, card)
+
+    def bid_bits(self, hand, current_bids):
+        return self.base.bid_bits(hand, current_bids)
+
+    def choose_trump_bits(self, hand):
+        return self.base.choose_trump_bits(hand)
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        if self.seat is None or hand.bit_count() > self.max_cards:
+            return self.base.lead_bits(hand, trump, trump_played, legal)
+        return self._solve(hand, legal)
+
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        if self.seat is None or hand.bit_count() > self.max_cards:
+            return self.base.follow_bits(hand, led, trump, trump_played, legal)
+        return self._solve(hand, legal)
+
+    def _solve(self, hand, legal=None):
+        trick = [card for _, card in self.trick]
+        trump_played = self.trump_played
+        if legal is None:
+            legal = self._legal(hand, trump_played)
+        if not legal & (legal - 1):
+            return legal.bit_length() - 1
+
+        position = self._position(hand, self.base)
+        remaining = hand | position.unseen
+        for card in trick:
+            remaining |= 1 << card
+        moves = distinct_moves(legal, remaining)
+        if not moves & (moves - 1):
+            return moves.bit_length() - 1
+
+        solver = EndgameSolver(position.trump, self.seat, self.cache, self.rules)
+        sampler = position.sampler()
+        samples = 1 if sampler.deals == 1 else self.samples
+        totals = {}
+        for _ in range(samples):
+            hands = sampler.sample(self.rng)
+            values = solver.move_values(
+                hands, position.leader, trick, trump_played
+            )
+            for card, value in values.items():
+                totals[card] = totals.get(card, 0) + value
+        best = max(totals.values())
+        return min(card for card, total in totals.items() if total == best)
@@ -0,0 +1,380 @@
+import mmap
+import os
+import random
+import struct
+import sys
+
+from batak import (
+    FULL_MASK,
+    SUITS,
+    Deck,
+    find_trick_winner,
+    play_game,
+    play_hand,
+    score_game,
+    simulate_game,
+)
+from tournament import deal_rng
+
+RECORDS_FILE = "games.bin"
+INDEX_SUFFIX = ".idx"
+
+# A record log is a file header followed by one variable-length record per
+# game: a fixed record header, one signed byte per bid and one byte per card
+# played. The seat of each card and the trick winners are not stored, since
+# they follow from the cards and the trump suit.
+HEADER = struct.Struct("<4sHxx")
+MAGIC = b"BKGR"
+VERSION = 1
+
+# Record header: cards played, players, highest bidder, trump, flags, seed.
+RECORD = struct.Struct("<BBBBBQ")
+HAS_SEED = 1
+SEED_LIMIT = 1 << 64
+BUFFER_SIZE = 1 << 20
+
+# The index next to a log holds the offset of every record as a
+# little-endian u64, so record i is found without scanning the log.
+OFFSET = struct.Struct("<Q")
+
+
+class GameRecord:
+    def __init__(self, bids, highest_bidder, trump, plays, seed=None, hands=None):
+        self.bids = bids
+        self.highest_bidder = highest_bidder
+        self.highest_bid = bids[highest_bidder]
+        self.trump = trump
+        self.plays = plays
+        self.seed = seed
+        self.hands = hands
+
+    def deal(self):
+        # The hands as dealt: known outright, reshuffled from the seed, or
+        # rebuilt from the cards each player went on to play.
+        num_players = len(self.bids)
+        if self.hands is not None:
+            return list(self.hands)
+        if self.seed is not None:
+            return Deck(random.Random(self.seed)).deal_masks(num_players)
+        hands = [0] * num_players
+        for trick in self.tricks():
+            for player, card in trick:
+                hands[player] |= 1 << card
+        # With 3 players the one card left over stays with the first seat.
+        hands[0] |= FULL_MASK & ~sum(hands)
+        return hands
+
+    def position(self, trick):
+        # State before trick `trick` (0-based) is led: the hands, the
+        # leader, the tricks won so far and whether trump has been played.
+        hands = self.deal()
+        tricks_won = [0] * len(self.bids)
+        leader = self.highest_bidder
+        trump_played = False
+        for played in self.tricks()[:trick]:
+            for player, card in played:
+                hands[player] &= ~(1 << card)
+            leader = find_trick_winner(played, self.trump)
+            tricks_won[leader] += 1
+            if not trump_played:
+                trump_played = any(card // 13 == self.trump for _, card in played)
+        return hands, leader, tricks_won, trump_played
+
+    def play_from(self, trick, personalities):
+        # Replays the recorded game up to `trick` and lets `personalities`
+        # play the rest, returning the tricks each player ends up with.
+        hands, leader, tricks_won, trump_played = self.position(trick)
+        rest = play_hand(leader, hands, self.trump, personalities, trump_played)
+        return [won + more for won, more in zip(tricks_won, rest)]
+
+    def tricks(self):
+        # Rebuilds (player, card) pairs for each trick from the play order.
+        num_players = len(self.bids)
+        leader = self.highest_bidder
+        tricks = []
+        for start in range(0, len(self.plays), num_players):
+            trick = [
+                ((leader + i) % num_players, card)
+                for i, card in enumerate(self.plays[start : start + num_players])
+            ]
+            tricks.append(trick)
+            leader = find_trick_winner(trick, self.trump)
+        return tricks
+
+    def tricks_won(self):
+        tricks_won = [0] * len(self.bids)
+        for trick in self.tricks():
+            tricks_won[find_trick_winner(trick, self.trump)] += 1
+        return tricks_won
+
+    def scores(self):
+        return score_game(self.tricks_won(), self.highest_bidder, self.highest_bid)
+
+    def __repr__(self):
+        return (
+            f"GameRecord(bids={self.bids}, highest_bidder={self.highest_bidder}, "
+            f"trump={self.trump}, plays={self.plays}, seed={self.seed})"
+        )
+
+
+def record_from_result(result, seed=None, hands=None):
+    return GameRecord(
+        result.bids,
+        result.highest_bidder,
+        SUITS.index(result.trump_suit),
+        result.plays,
+        seed,
+        hands,
+    )
+
+
+def stored_seed(seed):
+    # random.Random uses only the magnitude of an int seed, so a negative
+    # seed is stored as its absolute value; seeds that do not fit the
+    # record, such as strings or ints of 2**64 and over, are refused.
+    if not isinstance(seed, int) or abs(seed) >= SEED_LIMIT:
+        raise ValueError(f"cannot record seed {seed!r}: use an int below 2**64")
+    return abs(seed)
+
+
+def replay_game(rng, personalities=None, num_players=4, seed=None):
+    deck = Deck(rng)
+    result = simulate_game(num_players, personalities, rng=rng, deck=deck)
+    return record_from_result(result, seed, deck.deal_masks(num_players))
+
+
+def replay_seed(seed, personalities=None, num_players=4):
+    # The game play_game(seed=seed) plays with the same personalities.
+    return replay_game(random.Random(seed), personalities, num_players, seed)
+
+
+def replay_deal(master_seed, deal_index, personalities=None, num_players=4):
+    # Deal `deal_index` of tournament.run_tournament(master_seed=...).
+    return replay_game(deal_rng(master_seed, deal_index), personalities, num_players)
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def _record_end(data, offset):
+    # The offset just past the record at `offset`, or None when the log ends
+    # before the record does, as after a crash mid-write.
+    if offset + RECORD.size > len(data):
+        return None
+    num_cards, num_players = RECORD.unpack_from(data, offset)[:2]
+    end = offset + RECORD.size + num_players + num_cards
+    return end if end <= len(data) else None
+
+
+def _read_record(data, offset):
+    num_cards, num_players, highest_bidder, trump, flags, seed = RECORD.unpack_from(
+        data, offset
+    )
+    bids_offset = offset + RECORD.size
+    bids = list(struct.unpack_from(f"<{num_players}b", data, bids_offset))
+    plays_offset = bids_offset + num_players
+    plays = list(data[plays_offset : plays_offset + num_cards])
+    return GameRecord(
+        bids, highest_bidder, trump, plays, seed if flags & HAS_SEED else None
+    )
+
+
+def build_index(path=RECORDS_FILE):
+    # Rewrites the index of a log from a full scan, for logs written before
+    # indexes existed or whose index is out of step with the log.
+    return _write_index(path)[0]
+
+
+def _write_index(path):
+    # The number of complete records and the offset where they end.
+    count = 0
+    with open(path, "rb") as f, open(index_path(path), "wb") as index:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offset = HEADER.size
+            while True:
+                end = _record_end(data, offset)
+                if end is None:
+                    break
+                index.write(OFFSET.pack(offset))
+                count += 1
+                offset = end
+        finally:
+            data.close()
+    return count, offset
+
+
+def _index_is_current(path):
+    # True when the last indexed record ends exactly where the log does.
+    size = os.path.getsize(path)
+    try:
+        index_size = os.path.getsize(index_path(path))
+    except FileNotFoundError:
+        return False
+    if index_size % OFFSET.size:
+        return False
+    if not index_size:
+        return size == HEADER.size
+    with open(index_path(path), "rb") as index:
+        index.seek(index_size - OFFSET.size)
+        (offset,) = OFFSET.unpack(index.read(OFFSET.size))
+    with open(path, "rb") as f:
+        f.seek(offset)
+        header = f.read(RECORD.size)
+    if len(header) < RECORD.size:
+        return False
+    num_cards, num_players = RECORD.unpack(header)[:2]
+    return offset + RECORD.size + num_players + num_cards == size
+
+
+class RecordWriter:
+    def __init__(self, path=RECORDS_FILE, buffer_size=BUFFER_SIZE):
+        # A record cut short by a crash is dropped before appending, so new
+        # records never follow a torn one.
+        if os.path.exists(path) and os.path.getsize(path):
+            if not _index_is_current(path):
+                os.truncate(path, _write_index(path)[1])
+            self._index = open(index_path(path), "ab")
+            self._file = open(path, "ab", buffering=buffer_size)
+        else:
+            self._index = open(index_path(path), "wb")
+            self._file = open(path, "ab", buffering=buffer_size)
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+
+    def write(self, result, seed=None):
+        # The record is packed before anything is written, so a seed that
+        # cannot be stored leaves the log and its index as they were.
+        num_players = len(result.bids)
+        record = (
+            RECORD.pack(
+                len(result.plays),
+                num_players,
+                result.highest_bidder,
+                SUITS.index(result.trump_suit),
+                HAS_SEED if seed is not None else 0,
+                stored_seed(seed) if seed is not None else 0,
+            )
+            + struct.pack(f"<{num_players}b", *result.bids)
+            + bytes(result.plays)
+        )
+        self._index.write(OFFSET.pack(self._file.tell()))
+        self._file.write(record)
+
+    def flush(self):
+        # The log goes first, so the index never points past flushed data.
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordLog:
+    # Records are read straight from the memory-mapped log, so logs much
+    # larger than memory can be iterated or indexed into.
+    def __init__(self, path=RECORDS_FILE):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} game record log")
+
+        if not os.path.exists(index_path(path)):
+            build_index(path)
+        self._index = None
+        with open(index_path(path), "rb") as f:
+            count = os.fstat(f.fileno()).st_size // OFFSET.size
+            if count:
+                self._index = mmap.mmap(
+                    f.fileno(), count * OFFSET.size, access=mmap.ACCESS_READ
+                )
+
+        # Drop index entries whose record never made it to the log, and
+        # index records the index missed, by scanning from the last good one.
+        while count and _record_end(self._map, self._indexed(count - 1)) is None:
+            count -= 1
+        self._count = count
+        self._extra = []
+        offset = HEADER.size
+        if count:
+            offset = _record_end(self._map, self._indexed(count - 1))
+        end = _record_end(self._map, offset)
+        while end is not None:
+            self._extra.append(offset)
+            offset, end = end, _record_end(self._map, end)
+
+    def _indexed(self, i):
+        return OFFSET.unpack_from(self._index, i * OFFSET.size)[0]
+
+    def __len__(self):
+        return self._count + len(self._extra)
+
+    def offset(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("game record index out of range")
+        if i < self._count:
+            return self._indexed(i)
+        return self._extra[i - self._count]
+
+    def __getitem__(self, i):
+        return _read_record(self._map, self.offset(i))
+
+    def __iter__(self):
+        data = self._map
+        offset = HEADER.size
+        end = _record_end(data, offset)
+        # A record cut short by a crash mid-write ends the log.
+        while end is not None:
+            yield _read_record(data, offset)
+            offset, end = end, _record_end(data, end)
+
+    def deals(self, start=0, stop=None):
+        # Lazily yields (hands, bids, trump, tricks) for games start..stop,
+        # with the hands as dealt and each trick as (player, card) pairs.
+        if stop is None:
+            stop = len(self)
+        for i in range(start, stop):
+            record = self[i]
+            yield record.deal(), record.bids, record.trump, record.tricks()
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "index":
+        path = sys.argv[2] if len(sys.argv) > 2 else RECORDS_FILE
+        print(f"Indexed {build_index(path)} games in {index_path(path)}")
+        return
+
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    first_seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    # Refuse seeds the log cannot hold before playing any game.
+    stored_seed(first_seed)
+    stored_seed(first_seed + num_games - 1)
+    with RecordWriter() as recorder:
+        for seed in range(first_seed, first_seed + num_games):
+            play_game(log=None, save=False, recorder=recorder, seed=seed)
+    print(f"Recorded {num_games} games in {RECORDS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import random
+from bisect import bisect_right
+from math import factorial
+
+from batak import CLASSIC, FULL_MASK, SUIT_MASKS
+from solver import card_list
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CardInference:
+    # What the cards played so far reveal about the hidden hands under
+    # `rules`. A player who does not follow the led suit is void in it. When
+    # the rules make a player out of the led suit trump if able, one who
+    # neither follows nor trumps is void in trump as well, and when trump may
+    # not be led before it has been played, a player who leads it anyway
+    # holds nothing else. voids[player] is the union of the suit masks that
+    # player is known to be out of.
+    def __init__(self, num_players, trump, rules=CLASSIC):
+        self.trump = trump
+        self.rules = rules
+        self.trump_played = False
+        self.played = 0
+        self.cards_played = [0] * num_players
+        self.voids = [0] * num_players
+        self.trick = []
+
+    def observe(self, player, card):
+        suit = card // 13
+        trump = self.trump
+        if self.trick:
+            led = self.trick[0][1] // 13
+            if suit != led:
+                self.voids[player] |= SUIT_MASKS[led]
+                if suit != trump and self.rules.must_trump:
+                    self.voids[player] |= SUIT_MASKS[trump]
+        elif (
+            suit == trump
+            and not self.trump_played
+            and self.rules.trump_lead_needs_break
+        ):
+            self.voids[player] |= FULL_MASK & ~SUIT_MASKS[trump]
+        self.trick.append((player, card))
+        self.played |= 1 << card
+        self.cards_played[player] += 1
+        if len(self.trick) == len(self.cards_played):
+            if not self.trump_played:
+                self.trump_played = any(
+                    played // 13 == trump for _, played in self.trick
+                )
+            self.trick = []
+
+
+class DealSampler:
+    # Deals the unseen cards uniformly over the deals consistent with the
+    # hand sizes and known voids, without rejection. Voids are whole suits,
+    # so the unseen cards fall into groups (by suit) that the same players
+    # may hold. The number of consistent deals that remain after each group
+    # is split between its players is counted once and cached, so a sample
+    # only picks one split per group, weighted by those counts, and deals
+    # each group's cards out shuffled.
+    def __init__(self, seat, hand, unseen, cards_left, voids=None):
+        self.num_players = len(cards_left)
+        if voids is None:
+            voids = [0] * self.num_players
+        self.seat = seat
+        self.hand = hand
+        self.players = []
+        capacities = []
+        # Hands are filled in seat order when there are fewer unseen cards
+        # than places for them, and any cards left over once every hand is
+        # full, as in a 3-player deal, go to a sink slot that takes anything.
+        remaining = unseen.bit_count()
+        for player, count in enumerate(cards_left):
+            if player != seat and count:
+                self.players.append(player)
+                capacities.append(min(count, remaining))
+                remaining -= capacities[-1]
+        if remaining:
+            capacities.append(remaining)
+        self.capacities = tuple(capacities)
+        self.groups = self._groups(unseen, voids)
+        self._splits = {}
+        # deals is the number of consistent deals, each sampled equally often.
+        self.deals = self._count(0, self.capacities)
+        if not self.deals:
+            # The voids cannot all hold, which only happens after an illegal
+            # play; fall back to ignoring them.
+            self.groups = self._groups(unseen, [0] * self.num_players)
+            self._splits = {}
+            self.deals = self._count(0, self.capacities)
+
+    def _groups(self, unseen, voids):
+        groups = {}
+        for suit_mask in SUIT_MASKS:
+            cards = unseen & suit_mask
+            if not cards:
+                continue
+            allowed = tuple(
+                i
+                for i, player in enumerate(self.players)
+                if not voids[player] & suit_mask
+            )
+            if len(self.capacities) > len(self.players):
+                allowed += (len(self.players),)
+            groups[allowed] = groups.get(allowed, 0) | cards
+        return [
+            (allowed, cards, [1 << card for card in card_list(cards)])
+            for allowed, cards in groups.items()
+        ]
+
+    def _count(self, group, capacities):
+        # Consistent ways to deal groups `group` onwards into `capacities`,
+        # recording for each split of this group the cumulative ways and the
+        # capacities it leaves.
+        if group == len(self.groups):
+            return 0 if any(capacities) else 1
+        key = (group, capacities)
+        entry = self._splits.get(key)
+        if entry is None:
+            allowed, _, cards = self.groups[group]
+            total = 0
+            cumulative = []
+            splits = []
+            for counts in _splits(len(cards), [capacities[i] for i in allowed]):
+                left = list(capacities)
+                for i, count in zip(allowed, counts):
+                    left[i] -= count
+                left = tuple(left)
+                ways = self._count(group + 1, left)
+                if ways:
+                    ways *= factorial(len(cards))
+                    for count in counts:
+                        ways //= factorial(count)
+                    total += ways
+                    cumulative.append(total)
+                    splits.append((counts, left))
+            entry = self._splits[key] = (total, cumulative, splits)
+        return entry[0]
+
+    def sample(self, rng=random):
+        slots = [0] * len(self.capacities)
+        capacities = self.capacities
+        splits_by_state = self._splits
+        for group, (allowed, mask, cards) in enumerate(self.groups):
+            total, cumulative, splits = splits_by_state[(group, capacities)]
+            if len(splits) == 1:
+                counts, capacities = splits[0]
+            else:
+                counts, capacities = splits[
+                    bisect_right(cumulative, rng.randrange(total))
+                ]
+            if len(allowed) == 1:
+                slots[allowed[0]] |= mask
+                continue
+            cards = rng.sample(cards, len(cards))
+            start = 0
+            for i, count in zip(allowed, counts):
+                slots[i] |= sum(cards[start : start + count])
+                start += count
+
+        hands = [0] * self.num_players
+        hands[self.seat] = self.hand
+        for player, hand in zip(self.players, slots):
+            hands[player] = hand
+        return hands
+
+    def sample_many(self, count, rng=random):
+        return [self.sample(rng) for _ in range(count)]
+
+    def sample_array(self, count, seed=None):
+        # A (count, players) int64 array of sampled hands, drawn from the
+        # same distribution as sample() but a whole batch at a time.
+        if np is None:
+            raise RuntimeError("sample_array needs NumPy")
+        generator = np.random.default_rng(seed)
+        slots = np.zeros((count, len(self.capacities)), dtype=np.int64)
+        # Samples share a few capacity states after each group; labels says
+        # which one each sample is in.
+        states = [self.capacities]
+        labels = np.zeros(count, dtype=np.intp)
+        for group, (allowed, mask, cards) in enumerate(self.groups):
+            counts = np.zeros((count, len(allowed)), dtype=np.int64)
+            next_labels = np.zeros(count, dtype=np.intp)
+            next_states = {}
+            for label, capacities in enumerate(states):
+                rows = np.flatnonzero(labels == label)
+                if not len(rows):
+                    continue
+                total, cumulative, splits = self._splits[(group, capacities)]
+                if len(splits) == 1:
+                    choices = np.zeros(len(rows), dtype=np.intp)
+                else:
+                    thresholds = np.array([ways / total for ways in cumulative])
+                    choices = np.searchsorted(
+                        thresholds, generator.random(len(rows)), side="right"
+                    )
+                    np.minimum(choices, len(splits) - 1, out=choices)
+                counts[rows] = np.array([split for split, _ in splits])[choices]
+                split_labels = np.array(
+                    [
+                        next_states.setdefault(left, len(next_states))
+                        for _, left in splits
+                    ]
+                )
+                next_labels[rows] = split_labels[choices]
+            labels = next_labels
+            states = list(next_states)
+
+            if len(allowed) == 1:
+                slots[:, allowed[0]] |= mask
+                continue
+            # Each slot takes the next run of a shuffled row; the cards are
+            # distinct bits, so a run's sum is its mask.
+            shuffled = generator.permuted(
+                np.broadcast_to(np.array(cards, dtype=np.int64), (count, len(cards))),
+                axis=1,
+            )
+            prefix = np.zeros((count, len(cards) + 1), dtype=np.int64)
+            np.cumsum(shuffled, axis=1, out=prefix[:, 1:])
+            rows = np.arange(count)
+            start = np.zeros(count, dtype=np.int64)
+            for owner, slot in enumerate(allowed):
+                stop = start + counts[:, owner]
+                slots[:, slot] |= prefix[rows, stop] - prefix[rows, start]
+                start = stop
+
+        hands = np.zeros((count, self.num_players), dtype=np.int64)
+        hands[:, self.seat] = self.hand
+        for i, player in enumerate(self.players):
+            hands[:, player] = slots[:, i]
+        return hands
+
+
+def _splits(size, capacities):
+    # Every way to split `size` cards between players with the given room.
+    if not capacities:
+        if not size:
+            yield ()
+        return
+    if len(capacities) == 1:
+        if size <= capacities[0]:
+            yield (size,)
+        return
+    for count in range(min(size, capacities[0]) + 1):
+        for rest in _splits(size - count, capacities[1:]):
+            yield (count,) + rest
@@ -0,0 +1,225 @@
+import json
+import sys
+from bisect import bisect_left
+from time import perf_counter
+
+import batak
+
+# Upper bounds in seconds of the latency histogram buckets; the last bucket
+# counts everything slower.
+BUCKETS = (
+    1e-6,
+    2.5e-6,
+    5e-6,
+    1e-5,
+    2.5e-5,
+    5e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    1e-2,
+    1e-1,
+    1.0,
+)
+
+# What a game runs through: simulate_game bids with run_bidding, plays each
+# trick with play_state_trick and resolves it in GameState.apply.
+ENGINE_FUNCTIONS = (
+    "run_bidding",
+    "play_state_trick",
+    "score_game",
+    "save_results_to_file",
+)
+STATE_METHODS = ("apply", "undo")
+PERSONALITY_METHODS = (
+    "lead_bits",
+    "follow_bits",
+    "bid_bits",
+    "choose_trump_bits",
+    "lead_card",
+    "follow_card",
+    "bid",
+    "choose_trump_suit",
+    "start_play",
+    "observe_card",
+)
+
+
+class Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+
+
+class Metrics:
+    def __init__(self):
+        self.timings = {}
+
+    def timing(self, name, personality=""):
+        key = (name, personality)
+        timing = self.timings.get(key)
+        if timing is None:
+            timing = self.timings[key] = Timing()
+        return timing
+
+    def merge(self, other):
+        for (name, personality), timing in other.timings.items():
+            self.timing(name, personality).merge(timing)
+
+    def reset(self):
+        self.timings.clear()
+
+    def as_dict(self):
+        return [
+            {
+                "name": name,
+                "personality": personality,
+                "count": timing.count,
+                "total_seconds": timing.total,
+                "buckets": dict(
+                    zip([str(bound) for bound in BUCKETS] + ["+Inf"], timing.buckets)
+                ),
+            }
+            for (name, personality), timing in sorted(self.timings.items())
+        ]
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP batak_call_seconds Time spent in instrumented calls.",
+            "# TYPE batak_call_seconds histogram",
+        ]
+        for (name, personality), timing in sorted(self.timings.items()):
+            labels = f'name="{name}"'
+            if personality:
+                labels += f',personality="{personality}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), timing.buckets):
+                cumulative += count
+                lines.append(
+                    f'batak_call_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"batak_call_seconds_sum{{{labels}}} {timing.total}")
+            lines.append(f"batak_call_seconds_count{{{labels}}} {timing.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # Prometheus text format for .prom files, JSON otherwise.
+        with open(path, "w") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+METRICS = Metrics()
+
+# Originals of everything currently wrapped, so disable() can put them back.
+# Nothing is wrapped while instrumentation is off, so it costs nothing then.
+_patched = []
+
+
+def _timed_function(function, name, metrics):
+    # The timing is looked up per call, as in _timed_method, so calls made
+    # after metrics.reset() are still recorded.
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            metrics.timing(name).record(perf_counter() - start)
+
+    timed.__wrapped__ = function
+    return timed
+
+
+def _timed_method(method, name, metrics):
+    def timed(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.timing(name, type(self).__name__).record(perf_counter() - start)
+
+    timed.__wrapped__ = method
+    return timed
+
+
+def _personality_classes():
+    classes = []
+    pending = [batak.AIPersonality]
+    while pending:
+        cls = pending.pop()
+        classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+def enable(metrics=METRICS):
+    # Wraps the engine functions in batak, the GameState methods (timed as
+    # "GameState.apply" and so on) and the methods of every AIPersonality
+    # subclass defined so far. Modules that imported an engine function by
+    # name before this call keep the unwrapped one. Times are inclusive, so
+    # play_state_trick includes the personality calls and moves it makes.
+    if _patched:
+        disable()
+    for name in ENGINE_FUNCTIONS:
+        function = getattr(batak, name)
+        _patched.append((batak, name, function))
+        setattr(batak, name, _timed_function(function, name, metrics))
+    for name in STATE_METHODS:
+        method = batak.GameState.__dict__[name]
+        _patched.append((batak.GameState, name, method))
+        setattr(
+            batak.GameState,
+            name,
+            _timed_function(method, f"GameState.{name}", metrics),
+        )
+    for cls in _personality_classes():
+        for name in PERSONALITY_METHODS:
+            method = cls.__dict__.get(name)
+            if method is not None:
+                _patched.append((cls, name, method))
+                setattr(cls, name, _timed_method(method, name, metrics))
+
+
+def disable():
+    while _patched:
+        owner, name, original = _patched.pop()
+        setattr(owner, name, original)
+
+
+def enabled():
+    return bool(_patched)
+
+
+def main():
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+    enable()
+    try:
+        for seed in range(num_games):
+            batak.play_game(log=None, save=False, seed=seed)
+    finally:
+        disable()
+    if path is None:
+        print(METRICS.to_json())
+    else:
+        METRICS.dump(path)
+        print(f"Wrote timings for {num_games} games to {path}")
+
+
+if __name__ == "__main__":
+    main()
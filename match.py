@@ -0,0 +1,170 @@
+import math
+import os
+import sys
+from multiprocessing import Pool
+from statistics import NormalDist
+
+import batak
+from batak import simulate_game
+from tournament import deal_rng
+
+
+class MatchStats:
+    def __init__(self):
+        self.games = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def add(self, difference):
+        self.games += 1
+        self.total += difference
+        self.total_squares += difference * difference
+
+    def merge(self, other):
+        self.games += other.games
+        self.total += other.total
+        self.total_squares += other.total_squares
+
+    def mean(self):
+        return self.total / self.games if self.games else 0.0
+
+    def variance(self):
+        if self.games < 2:
+            return 0.0
+        mean = self.mean()
+        return (self.total_squares - self.games * mean * mean) / (self.games - 1)
+
+    def confidence_interval(self, error_rate=0.05):
+        # Normal approximation; the per-deal differences are bounded, so it
+        # is close after a few hundred deals.
+        z = NormalDist().inv_cdf(1 - error_rate / 2)
+        half_width = z * math.sqrt(self.variance() / max(self.games, 1))
+        return self.mean() - half_width, self.mean() + half_width
+
+    def llr(self, mu0, mu1):
+        # Log-likelihood ratio of mean mu1 against mu0 for normally
+        # distributed differences, using the sample variance.
+        variance = self.variance()
+        if not variance:
+            return 0.0
+        return (mu1 - mu0) * (self.total - self.games * (mu0 + mu1) / 2) / variance
+
+    def __repr__(self):
+        return (
+            f"MatchStats(games={self.games}, mean={self.mean():.4f}, "
+            f"variance={self.variance():.4f})"
+        )
+
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def match_deals(first, second, master_seed, start, stop, num_players=4):
+    # Each deal is scored as the first personality's average score per seat
+    # minus the second's. The two alternate seats, and which one sits in
+    # seat 1 alternates from deal to deal.
+    stats = MatchStats()
+    sides = (first, second)
+    for deal_index in range(start, stop):
+        seats = [(seat + deal_index) % 2 for seat in range(num_players)]
+        personalities = [sides[side]() for side in seats]
+        result = simulate_game(
+            num_players, personalities, rng=deal_rng(master_seed, deal_index)
+        )
+        totals = [0, 0]
+        for side, score in zip(seats, result.scores):
+            totals[side] += score
+        stats.add(totals[0] / seats.count(0) - totals[1] / seats.count(1))
+    return stats
+
+
+def _match_chunk(args):
+    return match_deals(*args)
+
+
+def run_match(
+    first,
+    second,
+    mu0=0.0,
+    mu1=0.5,
+    alpha=0.05,
+    beta=0.05,
+    batch_size=200,
+    max_games=1000000,
+    master_seed=0,
+    workers=None,
+    num_players=4,
+    log=None,
+):
+    # Sequential probability ratio test of "first outscores second by mu1
+    # points a deal" against "by mu0", checked after every batch of deals.
+    # Returns the stats and True (H1 accepted), False (H0 accepted) or None
+    # when max_games ran out first.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    lower, upper = sprt_bounds(alpha, beta)
+    stats = MatchStats()
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        while stats.games < max_games:
+            start = stats.games
+            stop = min(start + batch_size, max_games)
+            num_chunks = max(1, min(stop - start, workers))
+            bounds = [
+                start + (stop - start) * i // num_chunks
+                for i in range(num_chunks + 1)
+            ]
+            chunks = [
+                (first, second, master_seed, chunk_start, chunk_stop, num_players)
+                for chunk_start, chunk_stop in zip(bounds, bounds[1:])
+            ]
+            # Chunks are merged in order so the float sums, and with them the
+            # stopping point, do not depend on the worker count.
+            if pool is None:
+                results = map(_match_chunk, chunks)
+            else:
+                results = pool.imap(_match_chunk, chunks)
+            for chunk_stats in results:
+                stats.merge(chunk_stats)
+
+            llr = stats.llr(mu0, mu1)
+            if log is not None:
+                low, high = stats.confidence_interval(alpha)
+                log(
+                    f"{stats.games} games: mean {stats.mean():+.3f} "
+                    f"[{low:+.3f}, {high:+.3f}], LLR {llr:.2f} ({lower:.2f}, {upper:.2f})"
+                )
+            if llr >= upper:
+                return stats, True
+            if llr <= lower:
+                return stats, False
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return stats, None
+
+
+def main():
+    first = getattr(batak, sys.argv[1] if len(sys.argv) > 1 else "AggressivePlayer")
+    second = getattr(batak, sys.argv[2] if len(sys.argv) > 2 else "BalancedPlayer")
+    master_seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    stats, accepted = run_match(
+        first, second, master_seed=master_seed, workers=workers, log=print
+    )
+    if accepted is None:
+        print(f"No decision after {stats.games} games")
+    elif accepted:
+        print(f"{first.__name__} beats {second.__name__} after {stats.games} games")
+    else:
+        print(
+            f"{first.__name__} does not beat {second.__name__} "
+            f"after {stats.games} games"
+        )
+
+
+if __name__ == "__main__":
+    main()
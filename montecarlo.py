@@ -0,0 +1,326 @@
+import random
+import time
+
+from batak import (
+    CLASSIC,
+    FULL_MASK,
+    SUIT_MASKS,
+    AIPersonality,
+    BalancedPlayer,
+    GameState,
+    beats,
+    find_trick_winner,
+    play_hand,
+    play_state_trick,
+    score_game,
+)
+from inference import CardInference, DealSampler
+from solver import card_list, distinct_moves
+
+
+class Position:
+    def __init__(
+        self,
+        seat,
+        hand,
+        unseen,
+        cards_left,
+        trump,
+        trump_played,
+        leader,
+        trick,
+        tricks_won,
+        highest_bidder,
+        highest_bid,
+        policies,
+        voids=None,
+        rules=CLASSIC,
+    ):
+        self.seat = seat
+        self.hand = hand
+        self.unseen = unseen
+        self.cards_left = cards_left
+        self.trump = trump
+        self.trump_played = trump_played
+        self.leader = leader
+        self.trick = trick
+        self.tricks_won = tricks_won
+        self.highest_bidder = highest_bidder
+        self.highest_bid = highest_bid
+        self.policies = policies
+        self.voids = voids
+        self.rules = rules
+        self._sampler = None
+
+    def sampler(self):
+        # Deals hidden hands consistent with the hand sizes and known voids.
+        if self._sampler is None:
+            self._sampler = DealSampler(
+                self.seat, self.hand, self.unseen, self.cards_left, self.voids
+            )
+        return self._sampler
+
+    def sample_hands(self, rng):
+        return self.sampler().sample(rng)
+
+    def play_out(self, hands, move):
+        # The trick in progress goes back on a GameState under the rules in
+        # play, then `move` and the policies' cards finish the deal.
+        for player, card in self.trick:
+            hands[player] |= 1 << card
+        state = GameState(hands, self.trump, self.leader, self.trump_played, self.rules)
+        for _, card in self.trick:
+            state.apply(card)
+        state.apply(move)
+        while state.trick_size:
+            player = state.to_move()
+            card = self.policies[player].follow_bits(
+                state.hands[player],
+                state.led(),
+                self.trump,
+                state.trump_played,
+                state.legal_moves(),
+            )
+            state.apply(card)
+        while not state.is_over():
+            play_state_trick(state, self.policies)
+
+        tricks_won = [
+            won + more for won, more in zip(self.tricks_won, state.tricks_won)
+        ]
+        return score_game(tricks_won, self.highest_bidder, self.highest_bid)[
+            self.seat
+        ]
+
+
+def run_rollouts(position, move, count, seed):
+    rng = random.Random(seed)
+    total = 0
+    for _ in range(count):
+        total += position.play_out(position.sample_hands(rng), move)
+    return total
+
+
+def deal_sizes(num_players):
+    # Cards each seat is dealt; in a 3-player deal seat 0 gets the extra one.
+    size, extra = divmod(len(SUIT_MASKS) * 13, num_players)
+    return [size + (seat < extra) for seat in range(num_players)]
+
+
+def run_contract_rollouts(hand, trump, num_players, policies, rules, count, seed):
+    # Tricks the hand takes as declarer leading the first trick, one sample
+    # per rollout.
+    rng = random.Random(seed)
+    cards_left = deal_sizes(num_players)
+    cards_left[0] = hand.bit_count()
+    position = Position(
+        0,
+        hand,
+        FULL_MASK & ~hand,
+        cards_left,
+        trump,
+        False,
+        0,
+        [],
+        [0] * num_players,
+        0,
+        0,
+        policies,
+        rules=rules,
+    )
+    samples = []
+    for _ in range(count):
+        hands = position.sample_hands(rng)
+        samples.append(play_hand(0, hands, trump, policies, rules=rules)[0])
+    return samples
+
+
+class TrackingPersonality(AIPersonality):
+    # Follows the play through the observer hooks so a decision can be made
+    # from the current Position: the cards not yet seen, how many each
+    # player still holds, who is void in what, the trick in progress and
+    # the tricks won. `rules` is the variant being played, which decides
+    # what the cards played reveal.
+    observes_play = True
+    seat = None
+    rules = CLASSIC
+
+    def start_play(self, seat, bids, highest_bidder, trump):
+        self.seat = seat
+        self.highest_bidder = highest_bidder
+        self.highest_bid = bids[highest_bidder]
+        self.trump = trump
+        self.trump_played = False
+        self.leader = highest_bidder
+        self.trick = []
+        self.tricks_won = [0] * len(bids)
+        self.inference = CardInference(len(bids), trump, self.rules)
+
+    def observe_card(self, player, card):
+        self.inference.observe(player, card)
+        self.trick.append((player, card))
+        if len(self.trick) == len(self.tricks_won):
+            self.leader = find_trick_winner(self.trick, self.trump)
+            self.tricks_won[self.leader] += 1
+            if not self.trump_played:
+                self.trump_played = any(
+                    card // 13 == self.trump for _, card in self.trick
+                )
+            self.trick = []
+
+    def _legal(self, hand, trump_played):
+        # The cards the rules allow on the trick in progress.
+        led = winning = None
+        for _, card in self.trick:
+            if winning is None:
+                led, winning = card // 13, card
+            elif beats(card, winning, self.trump):
+                winning = card
+        return self.rules.legal_moves(hand, led, winning, self.trump, trump_played)
+
+    def _position(self, hand, policy):
+        cards_played = self.inference.cards_played
+        return Position(
+            self.seat,
+            hand,
+            FULL_MASK & ~hand & ~self.inference.played,
+            [
+                size - played
+                for size, played in zip(deal_sizes(len(cards_played)), cards_played)
+            ],
+            self.trump,
+            self.trump_played,
+            self.leader,
+            list(self.trick),
+            list(self.tricks_won),
+            self.highest_bidder,
+            self.highest_bid,
+            [policy] * len(self.tricks_won),
+            list(self.inference.voids),
+            self.rules,
+        )
+
+
+class MonteCarloPlayer(TrackingPersonality):
+    def __init__(
+        self,
+        rollouts=100,
+        time_limit=None,
+        playout=None,
+        executor=None,
+        batch_size=20,
+        num_players=4,
+        seed=None,
+        rules=CLASSIC,
+    ):
+        self.rollouts = rollouts
+        self.time_limit = time_limit
+        self.playout = playout if playout is not None else BalancedPlayer()
+        self.executor = executor
+        self.batch_size = batch_size
+        self.num_players = num_players
+        self.rng = random.Random(seed)
+        self.rules = rules
+        self._contract = None
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        if self.seat is None:
+            return self.playout.lead_bits(hand, trump, trump_played, legal)
+        if legal is None:
+            legal = self._legal(hand, trump_played)
+        return self._choose(hand, legal)
+
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        if self.seat is None:
+            return self.playout.follow_bits(hand, led, trump, trump_played, legal)
+        if legal is None:
+            legal = self._legal(hand, trump_played)
+        return self._choose(hand, legal)
+
+    def bid_bits(self, hand, current_bids):
+        trump, bid, _ = self._evaluate_contract(hand)
+        return max(bid, 1)
+
+    def choose_trump_bits(self, hand):
+        trump, _, _ = self._evaluate_contract(hand)
+        return trump
+
+    def _choose(self, hand, moves):
+        remaining = FULL_MASK & ~self.inference.played
+        candidates = card_list(distinct_moves(moves, remaining))
+        if len(candidates) == 1:
+            return candidates[0]
+
+        position = self._position(hand, self.playout)
+        totals = self._run(
+            [(run_rollouts, (position, move)) for move in candidates]
+        )
+        # Ties go to the lowest card, which keeps the higher one for later.
+        _, best_move = max(
+            zip(totals, candidates), key=lambda pair: pair[0]
+        )
+        return best_move
+
+    def _evaluate_contract(self, hand):
+        if self._contract is not None and self._contract[0] == hand:
+            return self._contract[1]
+
+        policies = [self.playout] * self.num_players
+        samples = self._run(
+            [
+                (
+                    run_contract_rollouts,
+                    (hand, trump, self.num_players, policies, self.rules),
+                )
+                for trump in range(len(SUIT_MASKS))
+            ],
+            combine=list.__add__,
+            start=[],
+        )
+
+        best = None
+        for trump, tricks in enumerate(samples):
+            for bid in range(1, hand.bit_count() + 1):
+                # Same rule as score_game for the declarer: made contracts
+                # score the tricks taken, failed ones lose the bid, and no
+                # tricks at all costs 4.
+                expected = sum(
+                    -4 if taken == 0 else taken if taken >= bid else -bid
+                    for taken in tricks
+                ) / len(tricks)
+                if best is None or expected > best[2]:
+                    best = (trump, bid, expected)
+
+        self._contract = (hand, best)
+        return best
+
+    def _run(self, jobs, combine=int.__add__, start=0):
+        # Spread rollouts over the jobs in rounds of batch_size until the
+        # rollout count or the time limit runs out.
+        deadline = None
+        if self.time_limit is not None:
+            deadline = time.monotonic() + self.time_limit
+        totals = [start] * len(jobs)
+        done = 0
+        while True:
+            count = min(self.batch_size, self.rollouts - done)
+            tasks = [
+                (function, args + (count, self.rng.getrandbits(64)))
+                for function, args in jobs
+            ]
+            if self.executor is not None:
+                futures = [
+                    self.executor.submit(function, *args) for function, args in tasks
+                ]
+                results = [future.result() for future in futures]
+            else:
+                results = [function(*args) for function, args in tasks]
+            totals = [
+                combine(total, result) for total, result in zip(totals, results)
+            ]
+            done += count
+            if done >= self.rollouts:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        return totals
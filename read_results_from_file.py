@@ -1,7 +1,26 @@
 import csv
+import os
+
+from results_store import (
+    MAGIC,
+    RESULTS_FILE,
+    TEXT_RESULTS_FILE,
+    ResultSet,
+    combined_totals,
+    import_text_results,
+    result_paths,
+)
 
 
 def read_results_from_file(file_name):
+    if not os.path.exists(file_name) or _is_binary(file_name):
+        # Binary results are read together with their unmerged shards.
+        results = []
+        for path in result_paths(file_name):
+            with ResultSet(path) as result_set:
+                results.extend(result_set)
+        return results
+
     results = []
 
     with open(file_name, "r") as file:
@@ -12,6 +31,11 @@ def read_results_from_file(file_name):
     return results
 
 
+def _is_binary(file_name):
+    with open(file_name, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
 def calculate_total_scores(results):
     total_scores = [0] * len(results[0])
 
@@ -23,9 +47,12 @@ def calculate_total_scores(results):
 
 
 def main():
-    file_name = "results.txt"
-    results = read_results_from_file(file_name)
-    total_scores = calculate_total_scores(results)
+    file_name = RESULTS_FILE
+    if not result_paths(file_name) and os.path.exists(TEXT_RESULTS_FILE):
+        # One-shot migration of results written before the binary format.
+        import_text_results(TEXT_RESULTS_FILE, file_name)
+
+    total_scores = combined_totals(file_name)
 
     for i, score in enumerate(total_scores):
         print(f"Player {i + 1}'s total score: {score}")
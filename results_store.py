@@ -0,0 +1,377 @@
+import csv
+import glob
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RESULTS_FILE = "results.bin"
+TEXT_RESULTS_FILE = "results.txt"
+
+# A results file is a 16-byte header followed by one fixed-width record per
+# game: a signed byte per player holding that player's score.
+HEADER = struct.Struct("<4sHHII")
+MAGIC = b"BKRS"
+VERSION = 1
+BUFFER_SIZE = 1 << 20
+SHARD_TAG = ".shard-"
+
+# The checkpoint sidecar stores how far a results file has been summed: the
+# record count, a CRC of the header and of the last records summed (to spot a
+# file that was rewritten rather than appended to) and the running totals.
+CHECKPOINT = struct.Struct("<4sHHQI")
+CHECKPOINT_MAGIC = b"BKRC"
+CHECKPOINT_SUFFIX = ".ckpt"
+CHECK_BYTES = 256
+
+
+def read_header(f):
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{f.name} is too short to be a results file")
+    magic, version, num_players, _, _ = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"{f.name} is not a results file")
+    if version != VERSION:
+        raise ValueError(f"{f.name} uses results format version {version}")
+    return num_players
+
+
+def _lock(f, blocking=True):
+    # Advisory lock shared by every writer of a file. Without fcntl (on
+    # Windows) it always succeeds, and concurrent writers must use shards.
+    if fcntl is None:
+        return True
+    flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+    try:
+        fcntl.flock(f, flags)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ResultWriter:
+    # Records are buffered in memory and appended in large batches under an
+    # exclusive lock, so processes sharing a file never interleave partial
+    # records. An exclusive writer holds the lock until it is closed, which
+    # keeps merge_shards off a shard that is still being written.
+    def __init__(
+        self,
+        path=RESULTS_FILE,
+        num_players=4,
+        buffer_size=BUFFER_SIZE,
+        exclusive=False,
+    ):
+        self.path = path
+        self.num_players = num_players
+        self.buffer_size = buffer_size
+        self.exclusive = exclusive
+        self._record = struct.Struct(f"<{num_players}b")
+        self._buffer = []
+        self._buffered = 0
+        self._file = open(path, "ab", buffering=0)
+        try:
+            _lock(self._file)
+            try:
+                self._check_header()
+            finally:
+                if not exclusive:
+                    _unlock(self._file)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _check_header(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._append(HEADER.pack(MAGIC, VERSION, self.num_players, 0, 0))
+            return
+        with open(self.path, "rb") as f:
+            existing = read_header(f)
+        if existing != self.num_players:
+            raise ValueError(
+                f"{self.path} holds {existing}-player games, not {self.num_players}"
+            )
+        # A record cut short by a crash is dropped before appending, so new
+        # records never follow a torn one.
+        torn = (size - HEADER.size) % self.num_players
+        if torn:
+            os.ftruncate(self._file.fileno(), size - torn)
+
+    def _append(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self._file.write(view) :]
+
+    def write(self, scores):
+        self.write_raw(self._record.pack(*scores))
+
+    def write_many(self, results):
+        pack = self._record.pack
+        self.write_raw(b"".join(pack(*scores) for scores in results))
+
+    def write_raw(self, records):
+        # Appends already encoded records, such as another file's.
+        if len(records) % self.num_players:
+            raise ValueError("records must be a whole number of results")
+        self._buffer.append(records)
+        self._buffered += len(records)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        if self.exclusive:
+            self._append(data)
+            return
+        _lock(self._file)
+        try:
+            self._append(data)
+        finally:
+            _unlock(self._file)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultSet:
+    def __init__(self, path=RESULTS_FILE):
+        with open(path, "rb") as f:
+            self.num_players = read_header(f)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # A record cut short by a crash mid-write is ignored.
+        self._count = (len(self._map) - HEADER.size) // self.num_players
+        end = HEADER.size + self._count * self.num_players
+        self._scores = memoryview(self._map)[HEADER.size : end].cast("b")
+
+    def __len__(self):
+        return self._count
+
+    def raw(self):
+        # The records as bytes, without the header or a trailing partial one.
+        return self._scores.cast("B")
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("result index out of range")
+        start = index * self.num_players
+        return self._scores[start : start + self.num_players].tolist()
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def as_array(self):
+        # Zero-copy (games, players) view of the scores.
+        if np is None:
+            raise RuntimeError("as_array needs NumPy")
+        scores = np.frombuffer(
+            self._map,
+            dtype=np.int8,
+            count=self._count * self.num_players,
+            offset=HEADER.size,
+        )
+        return scores.reshape(self._count, self.num_players)
+
+    def totals(self, start=0):
+        # Per-player totals over the records from `start` onwards.
+        if np is not None:
+            return self.as_array()[start:].sum(axis=0, dtype=np.int64).tolist()
+        offset = start * self.num_players
+        return [
+            sum(self._scores[offset + player :: self.num_players])
+            for player in range(self.num_players)
+        ]
+
+    def checksum(self, count):
+        end = HEADER.size + count * self.num_players
+        start = max(HEADER.size, end - CHECK_BYTES)
+        header_crc = zlib.crc32(self._map[: HEADER.size])
+        return zlib.crc32(self._map[start:end], header_crc)
+
+    def close(self):
+        self._scores.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_checkpoint(path, num_players):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) != CHECKPOINT.size + 8 * num_players:
+        return None
+    magic, version, players, count, checksum = CHECKPOINT.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC or version != VERSION or players != num_players:
+        return None
+    totals = list(struct.unpack_from(f"<{num_players}q", data, CHECKPOINT.size))
+    return count, checksum, totals
+
+
+def write_checkpoint(path, num_players, count, checksum, totals):
+    # Written beside the target and renamed over it, so a reader never sees
+    # a half-written checkpoint.
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(
+            CHECKPOINT.pack(CHECKPOINT_MAGIC, VERSION, num_players, count, checksum)
+        )
+        f.write(struct.pack(f"<{num_players}q", *totals))
+    os.replace(temp_path, path)
+
+
+def aggregate_totals(path=RESULTS_FILE, checkpoint_path=None):
+    # Per-player totals that only sum the records appended since the last
+    # call. A file that shrank or whose summed records changed is summed
+    # again from the start.
+    if checkpoint_path is None:
+        checkpoint_path = path + CHECKPOINT_SUFFIX
+    with ResultSet(path) as results:
+        count = len(results)
+        checkpoint = read_checkpoint(checkpoint_path, results.num_players)
+        if checkpoint is not None:
+            done, checksum, totals = checkpoint
+            if done > count or results.checksum(done) != checksum:
+                checkpoint = None
+        if checkpoint is None:
+            done, totals = 0, [0] * results.num_players
+        elif done == count:
+            return totals
+        totals = [total + new for total, new in zip(totals, results.totals(done))]
+        write_checkpoint(
+            checkpoint_path,
+            results.num_players,
+            count,
+            results.checksum(count),
+            totals,
+        )
+    return totals
+
+
+def shard_path(path=RESULTS_FILE, shard=None):
+    if shard is None:
+        shard = os.getpid()
+    root, ext = os.path.splitext(path)
+    return f"{root}{SHARD_TAG}{shard}{ext}"
+
+
+def shard_paths(path=RESULTS_FILE):
+    root, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(root)}{SHARD_TAG}*{ext}"))
+
+
+def result_paths(path=RESULTS_FILE):
+    # The consolidated file, if there is one, and every shard not merged yet.
+    paths = [path] if os.path.exists(path) else []
+    return paths + shard_paths(path)
+
+
+def open_shard(path=RESULTS_FILE, num_players=4, shard=None, buffer_size=BUFFER_SIZE):
+    # A writer of its own for one process (by default keyed by its pid), so
+    # parallel runs never contend for the consolidated file.
+    return ResultWriter(shard_path(path, shard), num_players, buffer_size, True)
+
+
+def merge_shards(path=RESULTS_FILE):
+    # Appends every shard that no writer holds open to the consolidated
+    # file and removes it. Returns the number of results merged.
+    merged = 0
+    for shard in shard_paths(path):
+        try:
+            f = open(shard, "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            if not _lock(f, blocking=False):
+                continue
+            # Another merge may have removed it between the open and the lock.
+            stat = os.fstat(f.fileno())
+            if stat.st_nlink == 0:
+                continue
+            if stat.st_size >= HEADER.size:
+                with ResultSet(shard) as results:
+                    with ResultWriter(path, results.num_players) as writer:
+                        writer.write_raw(results.raw())
+                    merged += len(results)
+            os.remove(shard)
+        if os.path.exists(shard + CHECKPOINT_SUFFIX):
+            os.remove(shard + CHECKPOINT_SUFFIX)
+    return merged
+
+
+def combined_totals(path=RESULTS_FILE):
+    # Per-player totals over the consolidated file and any unmerged shards.
+    totals = None
+    for part in result_paths(path):
+        part_totals = aggregate_totals(part)
+        if totals is None:
+            totals = part_totals
+        else:
+            totals = [total + more for total, more in zip(totals, part_totals)]
+    return totals
+
+
+def import_text_results(text_path=TEXT_RESULTS_FILE, path=RESULTS_FILE):
+    with open(text_path, "r") as file:
+        rows = [[int(score) for score in row] for row in csv.reader(file) if row]
+    if not rows:
+        raise ValueError(f"{text_path} has no results to import")
+    with ResultWriter(path, len(rows[0])) as writer:
+        writer.write_many(rows)
+    return len(rows)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        path = sys.argv[2] if len(sys.argv) > 2 else RESULTS_FILE
+        print(f"Merged {merge_shards(path)} results into {path}")
+        return
+
+    text_path = sys.argv[1] if len(sys.argv) > 1 else TEXT_RESULTS_FILE
+    path = sys.argv[2] if len(sys.argv) > 2 else RESULTS_FILE
+    count = import_text_results(text_path, path)
+    print(f"Imported {count} games from {text_path} into {path}")
+
+
+if __name__ == "__main__":
+    main()
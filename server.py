@@ -0,0 +1,474 @@
+import asyncio
+import functools
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from batak import (
+    CARDS,
+    CLASSIC,
+    RANKS,
+    SUITS,
+    AIPersonality,
+    BalancedPlayer,
+    Deck,
+    create_personalities,
+    find_trick_winner,
+    hand_cards,
+    simulate_game,
+)
+
+PORT = 8765
+MOVE_TIMEOUT = 30.0
+# Tables played at once by the default executor; each game holds a thread
+# until it ends, and tables beyond this wait for one.
+TABLE_THREADS = 128
+
+# Line protocol, one UTF-8 message per line. A client sends
+# "PLAY [table] [humans]" to sit at a new table (or join the named one until
+# its human seats are filled); AI personalities take the other seats. The
+# server then sends events:
+#   SEAT <seat>, HAND <cards>, BID <seat> <bid>,
+#   CONTRACT <seat> <bid> <trump>, CARD <seat> <card>, TRICK <seat>,
+#   RESULT <scores>, ERROR <reason>, TIMEOUT
+# and prompts that expect one reply line:
+#   BID? <other bids>  -> a number from 1 to the cards in hand
+#   TRUMP?             -> a suit (♠ ♡ ♢ ♣ or S H D C)
+#   PLAY? <legal cards> -> a card such as A♠ or AS
+# A prompt left unanswered for the move timeout is decided by a built-in
+# personality instead. Seats are numbered from 1, as in the game log.
+SUIT_LETTERS = {"S": 0, "H": 1, "D": 2, "C": 3, "♥": 1, "♦": 2}
+
+
+def format_cards(mask):
+    return " ".join(repr(card) for card in hand_cards(mask))
+
+
+def parse_suit(text):
+    text = text.strip().upper()
+    if text in SUIT_LETTERS:
+        return SUIT_LETTERS[text]
+    if len(text) == 1 and text in SUITS:
+        return SUITS.index(text)
+    return None
+
+
+def parse_bid(text, hand_size):
+    text = text.strip()
+    return int(text) if text.isdigit() and 1 <= int(text) <= hand_size else None
+
+
+def parse_card(text):
+    text = text.strip().upper()
+    if len(text) < 2 or text[0] not in RANKS:
+        return None
+    suit = parse_suit(text[1:])
+    if suit is None:
+        return None
+    return suit * 13 + RANKS.index(text[0])
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.lines = asyncio.Queue()
+        self.closed = False
+        self.gone = asyncio.Event()
+        self._reading = asyncio.ensure_future(self._read_lines())
+
+    async def _read_lines(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                await self.lines.put(line.decode("utf-8", "replace").strip())
+        except ConnectionError:
+            pass
+        self.closed = True
+        self.gone.set()
+        await self.lines.put(None)
+
+    async def read_line(self):
+        # The next line from the client, or None once it has gone.
+        if self.closed and self.lines.empty():
+            return None
+        return await self.lines.get()
+
+    async def send(self, message):
+        if self.closed:
+            return
+        try:
+            self.writer.write((message + "\n").encode("utf-8"))
+            await self.writer.drain()
+        except ConnectionError:
+            self.closed = True
+
+    async def ask(self, prompt, parse, timeout):
+        # Prompts until parse() accepts a reply, returning None once the
+        # timeout runs out or the client has gone.
+        while not self.lines.empty():
+            if self.lines.get_nowait() is None:
+                return None
+        await self.send(prompt)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.closed:
+            try:
+                line = await asyncio.wait_for(
+                    self.read_line(), max(deadline - loop.time(), 0)
+                )
+            except asyncio.TimeoutError:
+                await self.send("TIMEOUT")
+                return None
+            if line is None:
+                return None
+            value = parse(line)
+            if value is not None:
+                return value
+            await self.send(f"ERROR cannot use {line!r}")
+        return None
+
+    async def close(self):
+        self._reading.cancel()
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class Table:
+    def __init__(self, name, humans, num_players, rng):
+        self.name = name
+        self.rng = rng
+        self.personalities = create_personalities(num_players)
+        human_seats = rng.sample(range(num_players), humans)
+        self.seats = [
+            None if seat in human_seats else self.personalities[seat]
+            for seat in range(num_players)
+        ]
+        self.waiting = list(human_seats)
+        self.ready = asyncio.Event()
+        self.finished = asyncio.Event()
+
+    def sit(self, connection):
+        seat = self.waiting.pop(0)
+        self.seats[seat] = connection
+        if not self.waiting:
+            self.ready.set()
+        return seat
+
+    def leave(self, seat):
+        # Frees the seat of a client that hung up before the table filled.
+        self.seats[seat] = None
+        self.waiting.append(seat)
+
+    def connections(self):
+        return [seat for seat in self.seats if isinstance(seat, Connection)]
+
+    async def broadcast(self, message):
+        await asyncio.gather(*(conn.send(message) for conn in self.connections()))
+
+
+class GameServer:
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=PORT,
+        move_timeout=MOVE_TIMEOUT,
+        executor=None,
+        num_players=4,
+        writer=None,
+        rng=None,
+        rules=CLASSIC,
+    ):
+        self.host = host
+        self.port = port
+        self.move_timeout = move_timeout
+        # Each table's game runs here, so neither a slow AI decision nor the
+        # engine blocks the loop.
+        if executor is None:
+            executor = ThreadPoolExecutor(TABLE_THREADS)
+        self.executor = executor
+        self.num_players = num_players
+        self.writer = writer
+        self.rng = rng if rng is not None else random.Random()
+        self.rules = rules
+        self.fallback = BalancedPlayer()
+        self.tables = {}
+        self.games_played = 0
+        self._server = None
+        self._table_count = 0
+        self._handlers = {}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        # Stops accepting clients and hangs up on the connected ones; their
+        # unfinished tables are played out by the fallback personality.
+        if self._server is not None:
+            self._server.close()
+        for connection in list(self._handlers):
+            connection.writer.close()
+        await asyncio.gather(*self._handlers.values(), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def handle(self, reader, writer):
+        connection = Connection(reader, writer)
+        self._handlers[connection] = asyncio.current_task()
+        try:
+            while True:
+                line = await connection.read_line()
+                if line is None:
+                    return
+                words = line.split()
+                if not words or words[0].upper() != "PLAY":
+                    await connection.send("ERROR expected PLAY [table] [humans]")
+                    continue
+                table = self._table_for(words[1:])
+                if table is None:
+                    await connection.send("ERROR bad PLAY request")
+                    continue
+                seat = table.sit(connection)
+                await connection.send(f"SEAT {seat + 1}")
+                if table.ready.is_set():
+                    self.tables.pop(table.name, None)
+                    await self.play_table(table)
+                else:
+                    await self._wait_for_table(table, seat, connection)
+        finally:
+            del self._handlers[connection]
+            await connection.close()
+
+    async def _wait_for_table(self, table, seat, connection):
+        # A client that hangs up before its table fills gives the seat back;
+        # once the game has started, the fallback plays its moves.
+        finished = asyncio.ensure_future(table.finished.wait())
+        gone = asyncio.ensure_future(connection.gone.wait())
+        try:
+            await asyncio.wait({finished, gone}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            finished.cancel()
+            gone.cancel()
+        if table.ready.is_set():
+            await table.finished.wait()
+            return
+        table.leave(seat)
+        if not table.connections():
+            self.tables.pop(table.name, None)
+
+    def _table_for(self, args):
+        name = args[0] if args else None
+        try:
+            humans = int(args[1]) if len(args) > 1 else 1
+        except ValueError:
+            return None
+        if not 1 <= humans <= self.num_players:
+            return None
+        if name is not None and name in self.tables:
+            return self.tables[name]
+        self._table_count += 1
+        if name is None:
+            name = f"table-{self._table_count}"
+        rng = random.Random(self.rng.getrandbits(64))
+        table = Table(name, humans, self.num_players, rng)
+        if humans > 1:
+            self.tables[name] = table
+        return table
+
+    async def play_table(self, table):
+        # batak.simulate_game plays the deal in the executor, with every seat
+        # filled by a TableSeat that waits on this loop for a human's reply.
+        try:
+            deck = Deck(table.rng)
+            hands = deck.deal_masks(self.num_players)
+            for seat, player in enumerate(table.seats):
+                if isinstance(player, Connection):
+                    await player.send(f"HAND {format_cards(hands[seat])}")
+            loop = asyncio.get_running_loop()
+            seats = [
+                TableSeat(self, table, seat, loop) for seat in range(self.num_players)
+            ]
+            result = await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    simulate_game,
+                    self.num_players,
+                    seats,
+                    rng=table.rng,
+                    deck=deck,
+                    rules=self.rules,
+                ),
+            )
+            await table.broadcast(f"RESULT {' '.join(map(str, result.scores))}")
+            if self.writer is not None:
+                self.writer.write(result.scores)
+            self.games_played += 1
+            return result.scores
+        finally:
+            table.finished.set()
+
+
+class TableSeat(AIPersonality):
+    # The personality the engine sees in a seat. It runs in the executor
+    # thread playing the deal and hands every decision to the seat's client
+    # on the event loop, or to its AI personality, falling back to the
+    # server's built-in personality when a client times out or hangs up and
+    # when an AI plays an illegal card. It also tells the table about its
+    # bids and its client about the play.
+    observes_play = True
+
+    def __init__(self, server, table, seat, loop):
+        self.server = server
+        self.table = table
+        self.seat = seat
+        self.loop = loop
+        self.player = table.seats[seat]
+        self.human = isinstance(self.player, Connection)
+        self.trick = []
+
+    def _wait(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def _ask(self, prompt, parse):
+        return self._wait(self.player.ask(prompt, parse, self.server.move_timeout))
+
+    def _send(self, message):
+        self._wait(self.player.send(message))
+
+    def bid_bits(self, hand, current_bids):
+        bid = None
+        if self.human:
+            prompt = " ".join(["BID?"] + [str(bid) for bid in current_bids])
+            hand_size = hand.bit_count()
+            bid = self._ask(prompt, lambda text: parse_bid(text, hand_size))
+        if bid is None:
+            player = self.server.fallback if self.human else self.player
+            bid = player.bid_bits(hand, current_bids)
+        self._wait(self.table.broadcast(f"BID {self.seat + 1} {bid}"))
+        return bid
+
+    def choose_trump_bits(self, hand):
+        if self.human:
+            trump = self._ask("TRUMP?", parse_suit)
+            if trump is not None:
+                return trump
+            return self.server.fallback.choose_trump_bits(hand)
+        return self.player.choose_trump_bits(hand)
+
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        return self._card(hand, None, trump, trump_played, legal)
+
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        return self._card(hand, led, trump, trump_played, legal)
+
+    def _card(self, hand, led, trump, trump_played, legal):
+        player = self.player
+        if self.human:
+
+            def parse_move(text):
+                card = parse_card(text)
+                if card is None or not legal >> card & 1:
+                    return None
+                return card
+
+            card = self._ask(f"PLAY? {format_cards(legal)}", parse_move)
+            if card is not None:
+                return card
+            player = self.server.fallback
+        card = _decide_card(player, hand, led, trump, trump_played, legal)
+        if not legal >> card & 1:
+            # An AI seat that breaks the rules is overruled, as on a timeout.
+            card = _decide_card(
+                self.server.fallback, hand, led, trump, trump_played, legal
+            )
+        return card
+
+    def start_play(self, seat, bids, highest_bidder, trump):
+        self.trump = trump
+        if self.human:
+            self._send(
+                f"CONTRACT {highest_bidder + 1} {bids[highest_bidder]} {SUITS[trump]}"
+            )
+        elif self.player.observes_play:
+            self.player.start_play(seat, bids, highest_bidder, trump)
+
+    def observe_card(self, player, card):
+        if not self.human:
+            if self.player.observes_play:
+                self.player.observe_card(player, card)
+            return
+        self._send(f"CARD {player + 1} {CARDS[card]!r}")
+        self.trick.append((player, card))
+        if len(self.trick) == len(self.table.seats):
+            self._send(f"TRICK {find_trick_winner(self.trick, self.trump) + 1}")
+            self.trick = []
+
+
+def _decide_card(player, hand, led, trump, trump_played, legal):
+    if led is None:
+        return player.lead_bits(hand, trump, trump_played, legal)
+    return player.follow_bits(hand, led, trump, trump_played, legal)
+
+
+async def run_bot(host="127.0.0.1", port=PORT, table=None, humans=1):
+    # A loopback client that answers every prompt with the first option,
+    # used to exercise the server. Returns the final scores.
+    reader, writer = await asyncio.open_connection(host, port)
+    request = "PLAY" if table is None else f"PLAY {table} {humans}"
+    writer.write((request + "\n").encode("utf-8"))
+    scores = None
+    while scores is None:
+        line = (await reader.readline()).decode("utf-8").strip()
+        if not line:
+            break
+        words = line.split()
+        reply = None
+        if words[0] == "BID?":
+            reply = "1"
+        elif words[0] == "TRUMP?":
+            reply = "S"
+        elif words[0] == "PLAY?":
+            reply = words[1]
+        elif words[0] == "RESULT":
+            scores = [int(score) for score in words[1:]]
+        if reply is not None:
+            writer.write((reply + "\n").encode("utf-8"))
+            await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    return scores
+
+
+async def run_bots(count, host="127.0.0.1", port=PORT):
+    return await asyncio.gather(*(run_bot(host, port) for _ in range(count)))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "bots":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else PORT
+        results = asyncio.run(run_bots(count, port=port))
+        print(f"{sum(result is not None for result in results)} tables finished")
+        return
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    server = GameServer(port=port)
+    print(f"Serving Batak tables on port {port}")
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+import random
+import sys
+
+from batak import SUIT_MASKS, Deck, hand_mask, legal_moves, simulate_game
+
+NUM_PLAYERS = 4
+
+
+def distinct_moves(moves, remaining):
+    # Two cards of a suit in one hand are equivalent when no remaining card
+    # (in any hand or on the table) lies between them; keep the highest.
+    distinct = moves
+    rest = moves
+    while rest:
+        low = rest & -rest
+        rest ^= low
+        above = remaining & -(low << 1)
+        if above & -above & moves and (above & -above).bit_length() // 13 == (
+            low.bit_length() - 1
+        ) // 13:
+            distinct ^= low
+    return distinct
+
+
+def card_list(mask):
+    cards = []
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        cards.append(low.bit_length() - 1)
+    return cards
+
+
+class _OutOfNodes(Exception):
+    pass
+
+
+class DoubleDummySolver:
+    def __init__(self, hands, trump):
+        self.hands = [
+            hand if isinstance(hand, int) else hand_mask(hand) for hand in hands
+        ]
+        self.trump = trump
+        self.owners = [None] * 52
+        for seat, hand in enumerate(self.hands):
+            while hand:
+                low = hand & -hand
+                hand ^= low
+                self.owners[low.bit_length() - 1] = seat
+        self.nodes = 0
+        self._stop = float("inf")
+        self._tables = {}
+        self._suits = [{} for _ in SUIT_MASKS]
+
+    def max_tricks(self, player, leader, trump_broken=False):
+        return self.bounds(player, leader, trump_broken)[0]
+
+    def bounds(self, player, leader, trump_broken=False, node_limit=None):
+        # The range the tricks `player` can force lie in. Targets are tried
+        # from both ends of the range in turn, since those far from the
+        # answer settle quickly. With a node limit a target that uses up its
+        # share (half of what is left while the other end can still move)
+        # stops that end, and the range is returned once both have stopped.
+        # What was proved stays in the table, so a later call carries on.
+        self.player = player
+        self.table = self._tables.setdefault(player, {})
+        stop = float("inf") if node_limit is None else self.nodes + node_limit
+        hands = list(self.hands)
+        lower, upper = 0, hands[leader].bit_count()
+        stuck = [False, False]
+        high = False
+        while lower < upper and not all(stuck):
+            if not stuck[not high]:
+                high = not high
+            target = upper if high else lower + 1
+            if stuck[not high]:
+                self._stop = stop
+            else:
+                self._stop = self.nodes + (stop - self.nodes) // 2
+            try:
+                proved = self._search(hands, leader, trump_broken, target)[0]
+            except _OutOfNodes:
+                stuck[high] = True
+                hands = list(self.hands)
+                continue
+            finally:
+                self._stop = float("inf")
+            if proved:
+                lower = target
+            else:
+                upper = target - 1
+        return lower, upper
+
+    def solve(self, declarer, leader, trump_broken=False):
+        # The defenders play as one side, so whatever the declarer cannot
+        # force is exactly what the defenders can.
+        tricks = self.max_tricks(declarer, leader, trump_broken)
+        return tricks, self.hands[leader].bit_count() - tricks
+
+    # Searches return whether self.player can take `target` more tricks,
+    # together with the cards whose ranks the answer depended on: cards
+    # that won a trick over a lower card of their suit, and the top cards
+    # behind a bound. A table entry only has to match a position in the
+    # suit lengths of each hand and the owners of the cards from the
+    # lowest such card of each suit upwards, so positions that differ only
+    # in low cards share entries (partition search).
+
+    def _search(self, hands, leader, trump_broken, target, expand=True):
+        # With expand false, only the table and the bounds are tried and
+        # None is returned when they do not settle the position.
+        if target <= 0:
+            return True, 0
+        tricks_left = hands[leader].bit_count()
+        if target > tricks_left:
+            return False, 0
+
+        remaining = hands[0] | hands[1] | hands[2] | hands[3]
+        if tricks_left == 1:
+            led_suit = (hands[leader].bit_length() - 1) // 13
+            winning = (
+                remaining & SUIT_MASKS[self.trump]
+                or remaining & SUIT_MASKS[led_suit]
+            )
+            card = winning.bit_length() - 1
+            relevant = 1 << card if winning & (winning - 1) else 0
+            return self.owners[card] == self.player, relevant
+
+        key, owners, tops = self._key(remaining, leader, trump_broken)
+        entries = self.table.get(key)
+        if entries is None:
+            entries = self.table[key] = {}
+        for mask, (counts, bounds) in entries.items():
+            bound = bounds.get(owners & mask)
+            if bound is not None:
+                if bound[0] >= target:
+                    return True, self._top_cards(tops, counts)
+                if bound[1] < target:
+                    return False, self._top_cards(tops, counts)
+
+        ours, theirs, ours_relevant, theirs_relevant = self._trump_tricks(remaining)
+        sure, cashed = self._quick_tricks(hands, leader, trump_broken)
+        if leader == self.player:
+            if sure > ours:
+                ours, ours_relevant = sure, cashed
+        elif sure > theirs:
+            theirs, theirs_relevant = sure, cashed
+        if ours >= target:
+            self._store(entries, remaining, owners, ours_relevant, ours, tricks_left)
+            return True, ours_relevant
+        if tricks_left - theirs < target:
+            self._store(
+                entries, remaining, owners, theirs_relevant, 0, tricks_left - theirs
+            )
+            return False, theirs_relevant
+        if not expand:
+            return None
+
+        result, relevant = self._play(
+            hands, leader, trump_broken, target, 0, None, -1, -1, 0
+        )
+        if result:
+            self._store(entries, remaining, owners, relevant, target, tricks_left)
+        else:
+            self._store(entries, remaining, owners, relevant, 0, target - 1)
+        return result, relevant
+
+    def _key(self, remaining, leader, trump_broken):
+        # The key holds the leader, the trump flag and how many cards of
+        # each suit every hand has. `owners` lists the owner of each
+        # remaining card, two bits a card, highest card of a suit lowest,
+        # in one 26-bit field per suit. tops[suit][k] is the top k cards
+        # of the suit.
+        key = leader << 1 | trump_broken
+        owners = 0
+        tops = []
+        for suit, suits in enumerate(self._suits):
+            cards = remaining >> (13 * suit) & 0x1FFF
+            entry = suits.get(cards)
+            if entry is None:
+                lengths = 0
+                sequence = 0
+                top = [0]
+                for card in reversed(card_list(cards << (13 * suit))):
+                    owner = self.owners[card]
+                    lengths += 1 << (4 * owner)
+                    sequence |= owner << (2 * len(top) - 2)
+                    top.append(top[-1] | 1 << card)
+                entry = suits[cards] = (lengths, sequence, top)
+            key = key << 16 | entry[0]
+            owners = owners << 26 | entry[1]
+            tops.append(entry[2])
+        return key, owners, tops
+
+    def _store(self, entries, remaining, owners, relevant, lower, upper):
+        mask = 0
+        counts = []
+        for suit_mask in SUIT_MASKS:
+            cards = relevant & suit_mask
+            count = (remaining & suit_mask & -(cards & -cards)).bit_count()
+            mask = mask << 26 | (1 << 2 * count) - 1
+            counts.append(count)
+        bounds = entries.setdefault(mask, (counts, {}))[1]
+        bits = owners & mask
+        bound = bounds.get(bits)
+        if bound is None:
+            bounds[bits] = (lower, upper)
+        else:
+            bounds[bits] = (max(bound[0], lower), min(bound[1], upper))
+
+    def _top_cards(self, tops, counts):
+        cards = 0
+        for top, count in zip(tops, counts):
+            cards |= top[count]
+        return cards
+
+    def _trump_tricks(self, remaining):
+        # Sure trump tricks for each side. Every trump of our player wins its
+        # trick unless a higher defender trump falls on it, and a defender
+        # trump can only do that once, so the top j of its trumps take at
+        # least j tricks less the defender trumps above the lowest of them.
+        # A defender trump above all of our player's wins its trick too, so
+        # the defenders take at least as many as any one of them holds.
+        trumps = remaining & SUIT_MASKS[self.trump]
+        player = self.player
+        counts = [0] * NUM_PLAYERS
+        ours = theirs = 0
+        ours_relevant = theirs_relevant = 0
+        seen = 0
+        while trumps:
+            card = trumps.bit_length() - 1
+            trumps ^= 1 << card
+            seen |= 1 << card
+            owner = self.owners[card]
+            counts[owner] += 1
+            if owner == player:
+                sure = counts[player] * 2 - sum(counts)
+                if sure > ours:
+                    ours = sure
+                    ours_relevant = seen
+            elif not counts[player] and counts[owner] > theirs:
+                theirs = counts[owner]
+                theirs_relevant = seen
+        return ours, theirs, ours_relevant, theirs_relevant
+
+    def _quick_tricks(self, hands, seat, trump_broken):
+        # Tricks `seat` can cash from the top while keeping the lead. A side
+        # suit only counts while every other hand that could ruff (partners
+        # included, since a void hand must trump) still has to follow.
+        trump_mask = SUIT_MASKS[self.trump]
+        hand = hands[seat]
+        ruffers = [
+            hands[other]
+            for other in range(NUM_PLAYERS)
+            if other != seat and hands[other] & trump_mask
+        ]
+        remaining = hands[0] | hands[1] | hands[2] | hands[3]
+        tricks = 0
+        relevant = 0
+        for suit, suit_mask in enumerate(SUIT_MASKS):
+            out = remaining & suit_mask
+            top = 0
+            while out:
+                card = 1 << (out.bit_length() - 1)
+                relevant |= card
+                if not card & hand:
+                    break
+                top += 1
+                out ^= card
+            if not top:
+                continue
+            if suit == self.trump:
+                if trump_broken or not hand & ~trump_mask:
+                    tricks += top
+            else:
+                for ruffer in ruffers:
+                    top = min(top, (ruffer & suit_mask).bit_count())
+                tricks += top
+        return tricks, relevant
+
+    def _play(
+        self, hands, leader, trump_broken, target, position, led, best, winner, table
+    ):
+        self.nodes += 1
+        if self.nodes > self._stop:
+            raise _OutOfNodes()
+        seat = (leader + position) % NUM_PLAYERS
+        hand = hands[seat]
+        trump_mask = SUIT_MASKS[self.trump]
+        maximizing = seat == self.player
+        remaining = hands[0] | hands[1] | hands[2] | hands[3] | table
+        moves = distinct_moves(
+            legal_moves(hand, led, self.trump, trump_broken), remaining
+        )
+
+        if position == 0:
+            # Cash suit winners first, then try low leads.
+            winners = 0
+            for card in card_list(moves):
+                if not remaining & SUIT_MASKS[card // 13] & -(2 << card):
+                    winners |= 1 << card
+            order = card_list(winners)[::-1] + card_list(moves ^ winners)
+            beaters = moves
+        else:
+            best_suit_mask = SUIT_MASKS[best // 13]
+            if moves & best_suit_mask:
+                beaters = moves & best_suit_mask & -(2 << best)
+            elif best_suit_mask != trump_mask:
+                beaters = moves & trump_mask
+            else:
+                beaters = 0
+            if (winner == self.player) == maximizing:
+                # Our side is already winning the trick: duck first.
+                order = card_list(moves ^ beaters) + card_list(beaters)
+            else:
+                order = card_list(beaters) + card_list(moves ^ beaters)
+
+        relevant = 0
+        if position == NUM_PLAYERS - 1:
+            # Try the table and the bounds on every position the trick can
+            # end in before searching any of them.
+            pending = []
+            for card in order:
+                bit = 1 << card
+                hands[seat] = hand ^ bit
+                if bit & beaters:
+                    new_best, new_winner = card, seat
+                else:
+                    new_best, new_winner = best, winner
+                outcome = self._close(
+                    hands,
+                    trump_broken,
+                    target,
+                    table | bit,
+                    new_best,
+                    new_winner,
+                    expand=False,
+                )
+                hands[seat] = hand
+                if outcome is None:
+                    pending.append(card)
+                elif outcome[0] == maximizing:
+                    return outcome
+                else:
+                    relevant |= outcome[1]
+            order = pending
+
+        for card in order:
+            bit = 1 << card
+            hands[seat] = hand ^ bit
+            if bit & beaters:
+                new_best, new_winner = card, seat
+            else:
+                new_best, new_winner = best, winner
+            if position < NUM_PLAYERS - 1:
+                result, cards = self._play(
+                    hands,
+                    leader,
+                    trump_broken,
+                    target,
+                    position + 1,
+                    card // 13 if position == 0 else led,
+                    new_best,
+                    new_winner,
+                    table | bit,
+                )
+            else:
+                result, cards = self._close(
+                    hands, trump_broken, target, table | bit, new_best, new_winner
+                )
+            hands[seat] = hand
+            if result == maximizing:
+                return result, cards
+            relevant |= cards
+        return not maximizing, relevant
+
+    def _close(self, hands, trump_broken, target, trick, best, winner, expand=True):
+        # Searches on from the end of a trick. A card that beat a lower card
+        # of its suit won by its rank, so it becomes relevant.
+        outcome = self._search(
+            hands,
+            winner,
+            trump_broken or bool(trick & SUIT_MASKS[self.trump]),
+            target - (winner == self.player),
+            expand,
+        )
+        if outcome is not None and trick & SUIT_MASKS[best // 13] & ~(1 << best):
+            outcome = outcome[0], outcome[1] | 1 << best
+        return outcome
+
+
+def solve_deal(hands, trump, leader, declarer=None, trump_broken=False):
+    if declarer is None:
+        declarer = leader
+    return DoubleDummySolver(hands, trump).solve(declarer, leader, trump_broken)
+
+
+def main():
+    num_deals = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    # Every deal is solved exactly unless a node limit is given, in which
+    # case a hard deal stops with a range of tricks instead.
+    node_limit = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    for i in range(num_deals):
+        deck = Deck(rng)
+        result = simulate_game(deck=deck, rng=rng)
+        hands = deck.deal_masks(NUM_PLAYERS)
+        trump = Deck.suits.index(result.trump_suit)
+        solver = DoubleDummySolver(hands, trump)
+        bidder = result.highest_bidder
+        lower, upper = solver.bounds(bidder, bidder, node_limit=node_limit or None)
+        forced = lower if lower == upper else f"{lower}-{upper}"
+        print(
+            f"Deal {i + 1}: Player {bidder + 1} bid {result.highest_bid}, "
+            f"took {result.tricks_won[bidder]}, could force {forced}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import random
+
+import pytest
+
+import batak
+from batak import BATAK, CLASSIC, GameState, IllegalMove, Rules, hand_mask
+
+
+def cards(text):
+    # "AS KS 2H" style: rank then suit letter (S, H, D, C).
+    mask = 0
+    for name in text.split():
+        mask |= 1 << "SHDC".index(name[1]) * 13 + batak.RANKS.index(name[0])
+    return mask
+
+
+def card(text):
+    return cards(text).bit_length() - 1
+
+
+SPADES, HEARTS = 0, 1
+
+
+def test_classic_rules_match_legal_moves():
+    rng = random.Random(1)
+    for _ in range(500):
+        hand = hand_mask(rng.sample(batak.CARDS, 13))
+        led = rng.choice([None, 0, 1, 2, 3])
+        trump = rng.randrange(4)
+        trump_played = rng.random() < 0.5
+        winning = None if led is None else led * 13 + rng.randrange(13)
+        assert CLASSIC.legal_moves(
+            hand, led, winning, trump, trump_played
+        ) == batak.legal_moves(hand, led, trump, trump_played)
+
+
+def test_batak_rules_must_overtake_in_the_led_suit():
+    hand = cards("3S KS 4H")
+    legal = BATAK.legal_moves(hand, SPADES, card("QS"), HEARTS, True)
+    assert legal == cards("KS")
+    # Nothing higher: any card of the suit.
+    legal = BATAK.legal_moves(hand, SPADES, card("AS"), HEARTS, True)
+    assert legal == cards("3S KS")
+    # Trumped trick: following suit is still enough.
+    legal = BATAK.legal_moves(hand, SPADES, card("2H"), HEARTS, True)
+    assert legal == cards("3S KS")
+
+
+def test_batak_rules_must_overtrump():
+    hand = cards("3H QH 5D")
+    trumps = cards("3H QH")
+    assert BATAK.legal_moves(hand, SPADES, card("9H"), HEARTS, True) == cards("QH")
+    assert BATAK.legal_moves(hand, SPADES, card("KH"), HEARTS, True) == trumps
+    assert CLASSIC.legal_moves(hand, SPADES, card("9H"), HEARTS, True) == trumps
+
+
+def test_trump_lead_needs_break():
+    hand = cards("3H QH 5D")
+    assert CLASSIC.legal_moves(hand, None, None, HEARTS, False) == cards("5D")
+    assert CLASSIC.legal_moves(hand, None, None, HEARTS, True) == hand
+    trumps = cards("3H QH")
+    assert CLASSIC.legal_moves(trumps, None, None, HEARTS, False) == trumps
+    free = Rules(trump_lead_needs_break=False)
+    assert free.legal_moves(hand, None, None, HEARTS, False) == hand
+
+
+def test_without_must_trump_a_void_player_may_discard():
+    hand = cards("3H 5D")
+    assert CLASSIC.legal_moves(hand, SPADES, card("2S"), HEARTS, True) == cards("3H")
+    loose = Rules(must_trump=False)
+    assert loose.legal_moves(hand, SPADES, card("2S"), HEARTS, True) == hand
+
+
+class Reckless(batak.ConservativePlayer):
+    # Ignores the rules and always plays its highest card.
+    def lead_bits(self, hand, trump, trump_played, legal=None):
+        return hand.bit_length() - 1
+
+    def follow_bits(self, hand, led, trump, trump_played, legal=None):
+        return hand.bit_length() - 1
+
+
+def test_engine_rejects_illegal_cards():
+    personalities = [Reckless()] + batak.create_personalities(3)
+    with pytest.raises(IllegalMove):
+        for seed in range(20):
+            batak.simulate_game(
+                personalities=personalities, rng=random.Random(seed), rules=BATAK
+            )
+
+
+def snapshot(state):
+    return (
+        list(state.hands),
+        state.leader,
+        state.trump_played,
+        list(state.tricks_won),
+        state.trick_size,
+        state.trick_mask,
+        state.ply,
+        state.winning_card(),
+        state.legal_moves(),
+    )
+
+
+def test_game_state_apply_undo_round_trip():
+    rng = random.Random(3)
+    for _ in range(100):
+        hands = batak.Deck(rng).deal_masks(4)
+        rules = rng.choice([CLASSIC, BATAK])
+        state = GameState(
+            hands, rng.randrange(4), rng.randrange(4), rng.random() < 0.3, rules
+        )
+        snapshots = []
+        while not state.is_over():
+            snapshots.append(snapshot(state))
+            moves = state.legal_moves()
+            state.apply(rng.choice([c for c in range(52) if moves >> c & 1]))
+            if rng.random() < 0.2:
+                for _ in range(rng.randrange(1, min(6, len(snapshots)) + 1)):
+                    state.undo()
+                    assert snapshot(state) == snapshots.pop()
+        assert sum(state.tricks_won) == 13
+        while state.ply:
+            state.undo()
+            assert snapshot(state) == snapshots.pop()
+        assert state.hands == hands
+        with pytest.raises(IndexError):
+            state.undo()
+
+
+def test_game_state_matches_find_trick_winner():
+    rng = random.Random(4)
+    for _ in range(200):
+        hands = batak.Deck(rng).deal_masks(4)
+        leader = rng.randrange(4)
+        trump = rng.randrange(4)
+        state = GameState(hands, trump, leader)
+        trick = []
+        for _ in range(4):
+            moves = state.legal_moves()
+            card = rng.choice([c for c in range(52) if moves >> c & 1])
+            trick.append((state.to_move(), card))
+            winner = state.apply(card)
+        assert winner == batak.find_trick_winner(trick, trump)
+        assert state.leader == winner
+        assert state.tricks_won[winner] == 1
+
+
+def test_hand_masks_round_trip():
+    rng = random.Random(5)
+    for _ in range(100):
+        hand = sorted(rng.sample(batak.CARDS, 13), key=lambda card: card.id)
+        mask = hand_mask(hand)
+        assert mask.bit_count() == 13
+        assert batak.hand_cards(mask) == hand
+
+
+def test_rank_helpers_match_min_and_max_over_a_sorted_hand():
+    rng = random.Random(6)
+    for _ in range(500):
+        hand = sorted(rng.sample(batak.CARDS, rng.randrange(1, 14)), key=lambda c: c.id)
+        mask = hand_mask(hand)
+        ranks = [card.rank_index for card in hand]
+        assert batak.min_rank_card(mask) == hand[ranks.index(min(ranks))].id
+        assert batak.max_rank_card(mask) == hand[ranks.index(max(ranks))].id
+        assert batak.lowest_card(mask) == hand[0].id
+        assert batak.highest_card(mask) == hand[-1].id
+        for suit, suit_mask in enumerate(batak.SUIT_MASKS):
+            suited = [card for card in hand if card.suit_index == suit]
+            assert (mask & suit_mask).bit_count() == len(suited)
+        high = [card for card in hand if card.rank_index >= batak.HIGH_RANK]
+        assert (mask & batak.HIGH_MASK).bit_count() == len(high)
+
+
+def test_cards_are_interned():
+    card = batak.Card("A", "♠")
+    assert card is batak.CARDS[12]
+    assert card == batak.CARDS[12] and hash(card) == 12
+    assert repr(card) == "A♠"
+
+
+def test_list_and_bitmask_personality_calls_agree():
+    rng = random.Random(8)
+    for personality in batak.create_personalities(4):
+        for _ in range(100):
+            mask = batak.Deck(rng).deal_masks(4)[0]
+            cards = batak.hand_cards(mask)
+            trump = rng.randrange(4)
+            led = rng.randrange(4)
+            suit, led_suit = batak.SUITS[trump], batak.SUITS[led]
+            assert personality.lead_card(cards, suit, False).id == (
+                personality.lead_bits(mask, trump, False)
+            )
+            assert personality.follow_card(cards, led_suit, suit, True).id == (
+                personality.follow_bits(mask, led, trump, True)
+            )
+            assert personality.bid(cards, [2]) == personality.bid_bits(mask, [2])
+            assert batak.SUITS.index(personality.choose_trump_suit(cards)) == (
+                personality.choose_trump_bits(mask)
+            )
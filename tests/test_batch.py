@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import batak
+
+np = pytest.importorskip("numpy")
+batch = pytest.importorskip("batch")
+
+LINEUPS = [
+    ["ConservativePlayer", "AggressivePlayer", "BalancedPlayer", "OpportunisticPlayer"],
+    ["OpportunisticPlayer", "BalancedPlayer", "AggressivePlayer", "ConservativePlayer"],
+    ["OpportunisticPlayer"] * 4,
+]
+
+
+@pytest.mark.parametrize("names", LINEUPS)
+def test_batch_matches_simulate_game(names):
+    decks = [batak.Deck(random.Random(seed)) for seed in range(300)]
+    deals = np.array([deck.cards for deck in decks])
+    personalities = batak.create_personalities(4, names)
+    # A forced bid picks one of the tied players at random, so run every
+    # tie break and compare each game with the run that forced the same seat.
+    runs = [
+        batch.simulate_batch(deals, personalities, tie_breaks=np.full(len(deals), t))
+        for t in range(4)
+    ]
+    for i, deck in enumerate(decks):
+        result = batak.simulate_game(
+            4, personalities, rng=random.Random(i), deck=batak.Deck(cards=deck.cards)
+        )
+        run = next(r for r in runs if r.highest_bidder[i] == result.highest_bidder)
+        assert list(run.bids[i]) == result.bids
+        assert batak.SUITS[run.trump[i]] == result.trump_suit
+        assert list(run.tricks_won[i]) == result.tricks_won
+        assert list(run.scores[i]) == result.scores
+
+
+def test_batch_rejects_other_personalities():
+    class Custom(batak.BalancedPlayer):
+        pass
+
+    deals = batch.deal_batch(2, np.random.default_rng(0))
+    with pytest.raises(ValueError):
+        batch.simulate_batch(deals, [Custom()] + batak.create_personalities(3))
+    with pytest.raises(ValueError):
+        batch.simulate_batch(deals, batak.create_personalities(3))
+
+
+def test_deal_batch_deals_whole_decks():
+    deals = batch.deal_batch(50, np.random.default_rng(1))
+    assert deals.shape == (50, 52)
+    assert (np.sort(deals, axis=1) == np.arange(52)).all()
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import benchmark
+
+
+def test_compare_flags_only_slowdowns_beyond_the_threshold():
+    baseline = {"a": 100.0, "b": 100.0, "c": 100.0}
+    rates = {"a": 95.0, "b": 80.0, "c": 150.0, "new": 1.0}
+    assert benchmark.compare(rates, baseline, 0.1) == [("b", 100.0, 80.0)]
+
+
+def test_file_benchmarks_clean_up(tmp_path):
+    before = set(os.listdir(tempfile.gettempdir()))
+    rates = benchmark.run_benchmarks(["read_results_from_file"], repeat=1)
+    assert rates["read_results_from_file"] > 0
+    assert set(os.listdir(tempfile.gettempdir())) <= before
+    path = str(tmp_path / "baseline.json")
+    benchmark.save_baseline(rates, path)
+    assert benchmark.load_baseline(path) == rates
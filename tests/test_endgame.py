@@ -0,0 +1,56 @@
+import random
+
+import batak
+from batak import BATAK, CLASSIC, GameState
+from endgame import EndgameCache, EndgamePlayer, EndgameSolver
+from montecarlo import MonteCarloPlayer
+from solver import card_list
+
+
+def brute_force(state, player):
+    # Tricks `player` takes from here with every seat playing perfectly.
+    if state.is_over():
+        return state.tricks_won[player]
+    maximizing = state.to_move() == player
+    values = []
+    for card in card_list(state.legal_moves()):
+        state.apply(card)
+        values.append(brute_force(state, player))
+        state.undo()
+    return max(values) if maximizing else min(values)
+
+
+def test_solver_matches_brute_force_under_each_rule_set():
+    rng = random.Random(11)
+    cache = EndgameCache()
+    for rules in (CLASSIC, BATAK):
+        for _ in range(40):
+            size = rng.choice([2, 3])
+            cards = rng.sample(range(52), 4 * size)
+            hands = [sum(1 << card for card in cards[seat::4]) for seat in range(4)]
+            trump = rng.randrange(4)
+            leader = rng.randrange(4)
+            state = GameState(hands, trump, leader, rng.random() < 0.5, rules)
+            # A card already on the table, so the search starts mid-trick.
+            state.apply(card_list(state.legal_moves())[-1])
+            player = state.to_move()
+            solver = EndgameSolver(trump, player, cache, rules)
+            values = solver.move_values(
+                state.hands, leader, [state.plays[0]], state.trump_played
+            )
+            assert set(values) <= set(card_list(state.legal_moves()))
+            for card, value in values.items():
+                state.apply(card)
+                assert value == brute_force(state, player)
+                state.undo()
+
+
+def test_search_players_keep_to_the_rules():
+    for seed in range(3):
+        personalities = batak.create_personalities(4)
+        personalities[0] = EndgamePlayer(personalities[0], seed=seed, rules=BATAK)
+        personalities[2] = MonteCarloPlayer(rollouts=4, seed=seed, rules=BATAK)
+        result = batak.simulate_game(
+            personalities=personalities, rng=random.Random(seed), rules=BATAK
+        )
+        assert sum(result.tricks_won) == 13
@@ -0,0 +1,108 @@
+import os
+import random
+
+import pytest
+
+import batak
+from game_records import (
+    HEADER,
+    RECORD,
+    RecordLog,
+    RecordWriter,
+    build_index,
+    index_path,
+    replay_deal,
+    replay_seed,
+)
+from tournament import deal_rng
+
+
+def record_games(path, seeds):
+    with RecordWriter(path) as recorder:
+        for seed in seeds:
+            batak.play_game(log=None, save=False, recorder=recorder, seed=seed)
+
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / "games.bin")
+    seeds = [0, 1, 2**64 - 1, -5]
+    record_games(path, seeds)
+    with RecordLog(path) as log:
+        assert len(log) == 4
+        assert [record.seed for record in log] == [0, 1, 2**64 - 1, 5]
+        for seed, record in zip(seeds, log):
+            result = batak.simulate_game(rng=random.Random(seed))
+            assert record.bids == result.bids
+            assert record.plays == result.plays
+            assert record.scores() == result.scores
+            assert record.tricks_won() == result.tricks_won
+        # Random access through the index matches a scan.
+        assert log[2].plays == list(log)[2].plays
+        assert log[-1].seed == 5
+
+
+def test_unrecordable_seed_leaves_the_log_intact(tmp_path):
+    path = str(tmp_path / "games.bin")
+    record_games(path, [3])
+    for seed in (2**64, "abc"):
+        with pytest.raises(ValueError):
+            record_games(path, [seed])
+    record_games(path, [4])
+    with RecordLog(path) as log:
+        assert [record.seed for record in log] == [3, 4]
+    assert os.path.getsize(index_path(path)) == 16
+
+
+def test_torn_record_is_dropped(tmp_path):
+    path = str(tmp_path / "games.bin")
+    record_games(path, [1, 2])
+    with open(path, "ab") as f:
+        f.write(b"\x34\x04")
+    with RecordLog(path) as log:
+        assert len(log) == 2
+    record_games(path, [3])
+    with RecordLog(path) as log:
+        assert [record.seed for record in log] == [1, 2, 3]
+
+
+def test_missing_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / "games.bin")
+    record_games(path, range(5))
+    os.remove(index_path(path))
+    with RecordLog(path) as log:
+        assert [record.seed for record in log] == [0, 1, 2, 3, 4]
+    assert build_index(path) == 5
+    assert os.path.getsize(path) > HEADER.size
+
+
+def test_replay_and_positions():
+    record = replay_seed(7)
+    result = batak.simulate_game(rng=random.Random(7))
+    assert record.plays == result.plays
+    hands, leader, tricks_won, _ = record.position(5)
+    assert sum(tricks_won) == 5
+    assert all(hand.bit_count() == 8 for hand in hands)
+    assert record.play_from(0, batak.create_personalities(4)) == result.tricks_won
+
+    deal = replay_deal(11, 3)
+    expected = batak.simulate_game(rng=deal_rng(11, 3))
+    assert deal.plays == expected.plays
+
+
+def test_deals_yield_hands_bids_trump_and_tricks(tmp_path):
+    path = str(tmp_path / "games.bin")
+    record_games(path, range(5))
+    # A 4-player game takes a record header, a byte per bid and one per card.
+    assert os.path.getsize(path) == HEADER.size + 5 * (RECORD.size + 4 + 52)
+    with RecordLog(path) as log:
+        deals = list(log.deals(1, 4))
+    assert len(deals) == 3
+    for seed, (hands, bids, trump, tricks) in zip(range(1, 4), deals):
+        rng = random.Random(seed)
+        assert hands == batak.Deck(random.Random(seed)).deal_masks(4)
+        result = batak.simulate_game(rng=rng)
+        assert bids == result.bids
+        assert batak.SUITS[trump] == result.trump_suit
+        assert [card for trick in tricks for _, card in trick] == result.plays
+        for player, card in (pair for trick in tricks for pair in trick):
+            assert hands[player] >> card & 1
@@ -0,0 +1,107 @@
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+from batak import FULL_MASK, SUIT_MASKS, Rules
+from inference import CardInference, DealSampler, np
+
+SPADES, HEARTS, DIAMONDS, CLUBS = range(4)
+
+
+def card(suit, rank):
+    return suit * 13 + rank
+
+
+def test_off_suit_play_shows_a_void_and_no_trump_under_classic():
+    inference = CardInference(4, CLUBS)
+    inference.observe(0, card(SPADES, 5))
+    inference.observe(1, card(HEARTS, 2))
+    inference.observe(2, card(CLUBS, 3))
+    assert inference.voids[1] == SUIT_MASKS[SPADES] | SUIT_MASKS[CLUBS]
+    assert inference.voids[2] == SUIT_MASKS[SPADES]
+    assert inference.voids[0] == 0
+
+
+def test_discard_shows_no_trump_void_when_trumping_is_optional():
+    inference = CardInference(4, CLUBS, Rules(must_trump=False))
+    inference.observe(0, card(SPADES, 5))
+    inference.observe(1, card(HEARTS, 2))
+    assert inference.voids[1] == SUIT_MASKS[SPADES]
+
+
+def test_unbroken_trump_lead_shows_only_trump_left():
+    inference = CardInference(4, CLUBS)
+    inference.observe(0, card(CLUBS, 9))
+    assert inference.voids[0] == FULL_MASK & ~SUIT_MASKS[CLUBS]
+
+
+def test_trump_lead_after_trump_is_played_shows_nothing():
+    inference = CardInference(4, CLUBS)
+    for player, played in enumerate(
+        [card(SPADES, 5), card(CLUBS, 2), card(SPADES, 7), card(SPADES, 9)]
+    ):
+        inference.observe(player, played)
+    assert inference.trump_played
+    inference.observe(1, card(CLUBS, 11))
+    assert inference.voids[1] == SUIT_MASKS[SPADES]
+    assert inference.cards_played == [1, 2, 1, 1]
+
+
+def small_sampler():
+    # Six unseen cards, two of each of three suits, for seats 1-3 holding
+    # two each, with seat 1 known to be out of spades.
+    unseen = 0
+    for suit in (SPADES, HEARTS, DIAMONDS):
+        unseen |= 1 << card(suit, 0) | 1 << card(suit, 1)
+    hand = 1 << card(CLUBS, 0) | 1 << card(CLUBS, 1)
+    voids = [0, SUIT_MASKS[SPADES], 0, 0]
+    return DealSampler(0, hand, unseen, [2, 2, 2, 2], voids), hand, unseen, voids
+
+
+def consistent_deals(hand, unseen, voids):
+    cards = [c for c in range(52) if unseen >> c & 1]
+    deals = set()
+    for order in itertools.permutations(cards):
+        hands = [hand] + [sum(1 << c for c in order[i : i + 2]) for i in (0, 2, 4)]
+        if all(not hands[p] & voids[p] for p in range(4)):
+            deals.add(tuple(hands))
+    return deals
+
+
+def test_sampler_counts_and_samples_every_consistent_deal_uniformly():
+    sampler, hand, unseen, voids = small_sampler()
+    deals = consistent_deals(hand, unseen, voids)
+    assert sampler.deals == len(deals) == 36
+    samples = sampler.sample_many(36 * 200, random.Random(3))
+    counts = Counter(tuple(hands) for hands in samples)
+    assert set(counts) == deals
+    assert all(130 < count < 270 for count in counts.values())
+
+
+def test_sampler_respects_voids_and_capacities_on_a_3_player_deal():
+    rng = random.Random(5)
+    cards = list(range(52))
+    rng.shuffle(cards)
+    hand = sum(1 << c for c in cards[:18])
+    unseen = FULL_MASK & ~hand
+    voids = [0, SUIT_MASKS[HEARTS], SUIT_MASKS[SPADES]]
+    sampler = DealSampler(0, hand, unseen, [18, 17, 17], voids)
+    for hands in sampler.sample_many(200, rng):
+        assert hands[0] == hand
+        assert [h.bit_count() for h in hands] == [18, 17, 17]
+        assert hands[0] | hands[1] | hands[2] == FULL_MASK
+        assert not hands[1] & voids[1] and not hands[2] & voids[2]
+
+
+def test_sample_array_draws_consistent_deals():
+    if np is None:
+        pytest.skip("needs NumPy")
+    sampler, hand, unseen, voids = small_sampler()
+    deals = consistent_deals(hand, unseen, voids)
+    hands = sampler.sample_array(36 * 200, seed=7)
+    assert hands.shape == (36 * 200, 4)
+    counts = Counter(tuple(int(h) for h in row) for row in hands)
+    assert set(counts) == deals
+    assert all(130 < count < 270 for count in counts.values())
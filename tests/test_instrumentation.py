@@ -0,0 +1,35 @@
+import batak
+import instrumentation
+
+
+def test_times_the_engine_and_personalities_on_the_game_path():
+    metrics = instrumentation.Metrics()
+    apply = batak.GameState.apply
+    instrumentation.enable(metrics)
+    try:
+        batak.play_game(log=None, save=False, seed=1)
+    finally:
+        instrumentation.disable()
+    counts = {key: timing.count for key, timing in metrics.timings.items()}
+    assert counts[("run_bidding", "")] == 1
+    assert counts[("play_state_trick", "")] == 13
+    assert counts[("GameState.apply", "")] == 52
+    assert counts[("score_game", "")] == 1
+    calls = sum(count for (name, _), count in counts.items() if name.endswith("_bits"))
+    assert calls >= 52
+    assert batak.GameState.apply is apply
+    assert not instrumentation.enabled()
+
+
+def test_dump_formats(tmp_path):
+    metrics = instrumentation.Metrics()
+    metrics.timing("play_state_trick").record(2e-6)
+    metrics.timing("lead_bits", "BalancedPlayer").record(0.5)
+    prom = tmp_path / "timings.prom"
+    metrics.dump(str(prom))
+    text = prom.read_text()
+    assert 'name="lead_bits",personality="BalancedPlayer",le="1.0"} 1' in text
+    assert 'batak_call_seconds_count{name="play_state_trick"} 1' in text
+    json_path = tmp_path / "timings.json"
+    metrics.dump(str(json_path))
+    assert '"total_seconds": 0.5' in json_path.read_text()
@@ -0,0 +1,29 @@
+import random
+
+import batak
+from montecarlo import MonteCarloPlayer, deal_sizes
+
+
+def test_deal_sizes():
+    assert deal_sizes(4) == [13, 13, 13, 13]
+    assert deal_sizes(3) == [18, 17, 17]
+
+
+def test_three_player_game_with_monte_carlo_seat_zero():
+    for seed in (2, 13):
+        personalities = batak.create_personalities(3)
+        personalities[0] = MonteCarloPlayer(rollouts=4, num_players=3, seed=seed)
+        result = batak.simulate_game(
+            num_players=3, personalities=personalities, rng=random.Random(seed)
+        )
+        assert sum(result.tricks_won) == 17
+
+
+def test_monte_carlo_game_is_reproducible():
+    scores = []
+    for _ in range(2):
+        personalities = batak.create_personalities(4)
+        personalities[1] = MonteCarloPlayer(rollouts=4, seed=1)
+        result = batak.simulate_game(personalities=personalities, rng=random.Random(1))
+        scores.append(result.scores)
+    assert scores[0] == scores[1]
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from read_results_from_file import read_results_from_file
+from results_store import (
+    HEADER,
+    ResultSet,
+    ResultWriter,
+    aggregate_totals,
+    combined_totals,
+    import_text_results,
+    merge_shards,
+    open_shard,
+    shard_paths,
+)
+
+
+def test_write_and_read_back(tmp_path):
+    path = str(tmp_path / "results.bin")
+    with ResultWriter(path) as writer:
+        writer.write([3, -4, 5, 1])
+        writer.write_many([[-2, 0, 1, 7], [4, 4, -6, 2]])
+    with ResultSet(path) as results:
+        assert len(results) == 3
+        assert list(results) == [[3, -4, 5, 1], [-2, 0, 1, 7], [4, 4, -6, 2]]
+        assert results[-1] == [4, 4, -6, 2]
+        assert results.totals() == [5, 0, 0, 10]
+        assert results.totals(1) == [2, 4, -5, 9]
+
+
+def test_player_count_must_match(tmp_path):
+    path = str(tmp_path / "results.bin")
+    ResultWriter(path, 4).close()
+    with pytest.raises(ValueError):
+        ResultWriter(path, 3)
+
+
+def test_torn_record_is_dropped_before_appending(tmp_path):
+    path = str(tmp_path / "results.bin")
+    with ResultWriter(path) as writer:
+        writer.write([1, 2, 3, 4])
+    with open(path, "ab") as f:
+        f.write(bytes([9, 9]))
+    with ResultWriter(path) as writer:
+        writer.write([5, 6, 7, 8])
+    assert os.path.getsize(path) == HEADER.size + 8
+    with ResultSet(path) as results:
+        assert list(results) == [[1, 2, 3, 4], [5, 6, 7, 8]]
+
+
+def test_aggregate_totals_only_sums_new_records(tmp_path):
+    path = str(tmp_path / "results.bin")
+    with ResultWriter(path) as writer:
+        writer.write([1, 1, 1, 1])
+    assert aggregate_totals(path) == [1, 1, 1, 1]
+    assert os.path.exists(path + ".ckpt")
+    with ResultWriter(path) as writer:
+        writer.write([2, 0, -1, 3])
+    assert aggregate_totals(path) == [3, 1, 0, 4]
+    assert aggregate_totals(path) == [3, 1, 0, 4]
+
+
+def test_aggregate_totals_resums_a_rewritten_file(tmp_path):
+    path = str(tmp_path / "results.bin")
+    with ResultWriter(path) as writer:
+        writer.write([1, 1, 1, 1])
+    aggregate_totals(path)
+    os.remove(path)
+    with ResultWriter(path) as writer:
+        writer.write([5, 0, 0, 0])
+    assert aggregate_totals(path) == [5, 0, 0, 0]
+
+
+def test_import_text_results(tmp_path):
+    text_path = tmp_path / "results.txt"
+    text_path.write_text("1,2,3,4\n-4,5,6,-7\n")
+    path = str(tmp_path / "results.bin")
+    assert import_text_results(str(text_path), path) == 2
+    with ResultSet(path) as results:
+        assert results.totals() == [-3, 7, 9, -3]
+
+
+def test_shards_are_read_with_the_consolidated_file(tmp_path):
+    path = str(tmp_path / "results.bin")
+    with ResultWriter(path) as writer:
+        writer.write([1, 2, 3, 4])
+    for shard, row in [(7, [-4, 0, 2, 1]), (8, [3, 3, -1, 0])]:
+        with open_shard(path, shard=shard) as writer:
+            writer.write(row)
+    assert len(shard_paths(path)) == 2
+    assert combined_totals(path) == [0, 5, 4, 5]
+    assert sorted(read_results_from_file(path)) == sorted(
+        [[1, 2, 3, 4], [-4, 0, 2, 1], [3, 3, -1, 0]]
+    )
+
+
+def test_merge_folds_finished_shards_and_skips_open_ones(tmp_path):
+    path = str(tmp_path / "results.bin")
+    with open_shard(path, shard=1) as writer:
+        writer.write_many([[1, 1, 1, 1], [2, 0, -4, 3]])
+    busy = open_shard(path, shard=2)
+    busy.write([5, 5, 5, 5])
+    busy.flush()
+    try:
+        assert merge_shards(path) == 2
+        assert shard_paths(path) == [busy.path]
+    finally:
+        busy.close()
+    assert merge_shards(path) == 1
+    assert shard_paths(path) == []
+    with ResultSet(path) as results:
+        assert len(results) == 3
+    assert combined_totals(path) == [8, 6, 2, 9]
@@ -0,0 +1,56 @@
+import asyncio
+import random
+
+import batak
+from server import GameServer, parse_bid, parse_card, parse_suit, run_bot
+
+
+def test_parsers():
+    assert parse_bid("3", 13) == 3
+    assert parse_bid("14", 13) is None
+    assert parse_bid("0", 13) is None
+    assert parse_suit("h") == 1
+    assert parse_suit("♣") == 3
+    assert parse_card("AS") == 12
+    assert parse_card("t♡") == 21
+    assert parse_card("1S") is None
+
+
+async def _bots(server, count):
+    await server.start()
+    try:
+        return await asyncio.gather(*(run_bot(port=server.port) for _ in range(count)))
+    finally:
+        await server.close()
+
+
+def test_bot_tables_finish():
+    server = GameServer(port=0, rng=random.Random(1), rules=batak.BATAK)
+    results = asyncio.run(asyncio.wait_for(_bots(server, 5), 60))
+    assert all(len(scores) == 4 for scores in results)
+    assert server.games_played == 5
+
+
+async def _silent_client(server):
+    # Sits down and never answers, so every prompt times out.
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"PLAY\n")
+        lines = []
+        while not lines or not lines[-1].startswith("RESULT"):
+            lines.append((await reader.readline()).decode("utf-8").strip())
+        writer.close()
+        return lines
+    finally:
+        await server.close()
+
+
+def test_timed_out_seat_is_played_by_the_fallback():
+    server = GameServer(port=0, move_timeout=0.01, rng=random.Random(2))
+    lines = asyncio.run(asyncio.wait_for(_silent_client(server), 60))
+    assert lines[0].startswith("SEAT ")
+    assert "TIMEOUT" in lines
+    assert sum(line.startswith("TRICK ") for line in lines) == 13
+    assert sum(line.startswith("CARD ") for line in lines) == 52
+    assert server.games_played == 1
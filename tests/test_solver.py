@@ -0,0 +1,73 @@
+import random
+
+from batak import find_trick_winner, legal_moves
+from solver import DoubleDummySolver, card_list, distinct_moves
+
+
+def brute_force(hands, leader, trump, trump_broken, player):
+    # Plain minimax over every legal card, with no pruning at all.
+    if not hands[leader]:
+        return 0
+
+    def play(position, led, trick):
+        seat = (leader + position) % 4
+        values = []
+        for card in card_list(legal_moves(hands[seat], led, trump, trump_broken)):
+            hands[seat] ^= 1 << card
+            played = trick + [(seat, card)]
+            if position == 3:
+                winner = find_trick_winner(played, trump)
+                broken = trump_broken or any(c // 13 == trump for _, c in played)
+                value = (winner == player) + brute_force(
+                    hands, winner, trump, broken, player
+                )
+            else:
+                value = play(position + 1, card // 13 if position == 0 else led, played)
+            hands[seat] ^= 1 << card
+            values.append(value)
+        return max(values) if seat == player else min(values)
+
+    return play(0, None, [])
+
+
+def random_deal(rng, size):
+    cards = rng.sample(range(52), 4 * size)
+    return [sum(1 << card for card in cards[seat::4]) for seat in range(4)]
+
+
+def test_matches_brute_force_on_small_deals():
+    rng = random.Random(7)
+    for _ in range(60):
+        hands = random_deal(rng, rng.choice([2, 3, 4]))
+        trump = rng.randrange(4)
+        leader = rng.randrange(4)
+        broken = rng.random() < 0.5
+        solver = DoubleDummySolver(hands, trump)
+        # One solver for every player, so the tables are shared across calls.
+        for player in range(4):
+            expected = brute_force(list(hands), leader, trump, broken, player)
+            assert solver.max_tricks(player, leader, broken) == expected
+
+
+def test_solve_splits_the_tricks():
+    rng = random.Random(3)
+    hands = random_deal(rng, 4)
+    solver = DoubleDummySolver(hands, 1)
+    declarer, defenders = solver.solve(2, 0)
+    assert declarer + defenders == 4
+    assert declarer == brute_force(list(hands), 0, 1, False, 2)
+
+
+def test_node_limit_gives_a_range_around_the_exact_value():
+    rng = random.Random(5)
+    hands = random_deal(rng, 5)
+    exact = DoubleDummySolver(hands, 0).max_tricks(0, 0)
+    lower, upper = DoubleDummySolver(hands, 0).bounds(0, 0, node_limit=50)
+    assert lower <= exact <= upper
+
+
+def test_distinct_moves_keeps_one_card_of_a_sequence():
+    # Hearts 5 and 6 touch, the 8 is separated by the 7 held elsewhere.
+    hand = 1 << 16 | 1 << 17 | 1 << 19
+    remaining = hand | 1 << 18
+    assert card_list(distinct_moves(hand, remaining)) == [17, 19]
@@ -0,0 +1,31 @@
+import batak
+import tuning
+
+
+def tiny_tune(generations):
+    return tuning.tune(
+        "BalancedPlayer",
+        generations,
+        population_size=3,
+        elite=1,
+        deals_per_generation=20,
+        batch_size=10,
+        workers=1,
+    )
+
+
+def test_zero_generations_returns_the_best_starting_candidate():
+    parameters, stats = tiny_tune(0)
+    assert len(parameters) == len(tuning.PARAMETERS)
+    assert stats.games > 0
+
+
+def test_tuning_is_deterministic():
+    assert tiny_tune(2)[0] == tiny_tune(2)[0]
+
+
+def test_parameters_round_trip_through_a_personality():
+    parameters = (3, 2, 9)
+    cls = tuning.make_personality("Probe", "BalancedPlayer", parameters)
+    assert tuning.parameters_of(cls) == parameters
+    assert issubclass(cls, batak.BalancedPlayer)
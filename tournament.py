@@ -0,0 +1,232 @@
+import os
+import random
+import sys
+from multiprocessing import Pool
+
+from batak import Deck, create_personalities, play_game, simulate_game
+
+
+class TournamentTotals:
+    def __init__(self, num_players):
+        self.games = 0
+        self.scores = [0] * num_players
+        self.tricks_won = [0] * num_players
+        self.contracts = [0] * num_players
+        self.contracts_made = [0] * num_players
+        self.zero_trick_games = [0] * num_players
+
+    def add_game(self, result):
+        self.games += 1
+        for i, (score, tricks) in enumerate(zip(result.scores, result.tricks_won)):
+            self.scores[i] += score
+            self.tricks_won[i] += tricks
+            if tricks == 0:
+                self.zero_trick_games[i] += 1
+        self.contracts[result.highest_bidder] += 1
+        if result.tricks_won[result.highest_bidder] >= result.highest_bid:
+            self.contracts_made[result.highest_bidder] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        for field in (
+            "scores",
+            "tricks_won",
+            "contracts",
+            "contracts_made",
+            "zero_trick_games",
+        ):
+            totals = getattr(self, field)
+            for i, value in enumerate(getattr(other, field)):
+                totals[i] += value
+
+    def __repr__(self):
+        return (
+            f"TournamentTotals(games={self.games}, scores={self.scores}, "
+            f"tricks_won={self.tricks_won}, contracts={self.contracts}, "
+            f"contracts_made={self.contracts_made}, "
+            f"zero_trick_games={self.zero_trick_games})"
+        )
+
+
+class DuplicateTotals:
+    # Totals per personality rather than per seat. Each deal is played once
+    # per rotation of the personalities around the table, and a score is
+    # also counted relative to par, the average score of its seat over the
+    # rotations, which takes most of the card luck out.
+    def __init__(self, num_players):
+        self.deals = 0
+        self.scores = [0] * num_players
+        self.relative = [0.0] * num_players
+        self.relative_squares = [0.0] * num_players
+
+    def add_deal(self, rotation_scores):
+        num_players = len(self.scores)
+        par = [
+            sum(scores[seat] for scores in rotation_scores) / len(rotation_scores)
+            for seat in range(num_players)
+        ]
+        relative = [0.0] * num_players
+        for rotation, scores in enumerate(rotation_scores):
+            for seat, score in enumerate(scores):
+                player = (seat + rotation) % num_players
+                self.scores[player] += score
+                relative[player] += score - par[seat]
+        self.deals += 1
+        for player, value in enumerate(relative):
+            self.relative[player] += value
+            self.relative_squares[player] += value * value
+
+    def merge(self, other):
+        self.deals += other.deals
+        for field in ("scores", "relative", "relative_squares"):
+            totals = getattr(self, field)
+            for i, value in enumerate(getattr(other, field)):
+                totals[i] += value
+
+    def standard_errors(self):
+        # Standard error of each personality's mean relative score per deal.
+        if self.deals < 2:
+            return [0.0] * len(self.scores)
+        errors = []
+        for total, squares in zip(self.relative, self.relative_squares):
+            mean = total / self.deals
+            variance = (squares - self.deals * mean * mean) / (self.deals - 1)
+            errors.append((max(variance, 0.0) / self.deals) ** 0.5)
+        return errors
+
+    def __repr__(self):
+        return (
+            f"DuplicateTotals(deals={self.deals}, scores={self.scores}, "
+            f"relative={self.relative})"
+        )
+
+
+def deal_rng(master_seed, deal_index):
+    # Every deal owns its own stream, so totals only depend on the master seed
+    # and the number of games, never on how deals are split between workers.
+    return random.Random(f"{master_seed}:{deal_index}")
+
+
+def play_deals(master_seed, start, stop, num_players=4):
+    totals = TournamentTotals(num_players)
+    personalities = create_personalities(num_players)
+    for deal_index in range(start, stop):
+        rng = deal_rng(master_seed, deal_index)
+        totals.add_game(simulate_game(num_players, personalities, rng=rng))
+    return totals
+
+
+def play_duplicate_deals(master_seed, start, stop, num_players=4):
+    totals = DuplicateTotals(num_players)
+    personalities = create_personalities(num_players)
+    for deal_index in range(start, stop):
+        # The deal is shuffled once and every rotation replays the same cards,
+        # starting from the same random state so bidding ties are broken alike.
+        rng = deal_rng(master_seed, deal_index)
+        cards = Deck(rng).cards
+        state = rng.getstate()
+        rotation_scores = []
+        for rotation in range(num_players):
+            rng.setstate(state)
+            rotated = personalities[rotation:] + personalities[:rotation]
+            result = play_game(
+                num_players,
+                rotated,
+                log=None,
+                save=False,
+                rng=rng,
+                deck=Deck(cards=cards),
+            )
+            rotation_scores.append(result.scores)
+        totals.add_deal(rotation_scores)
+    return totals
+
+
+def _play_chunk(args):
+    return play_deals(*args)
+
+
+def _play_duplicate_chunk(args):
+    return play_duplicate_deals(*args)
+
+
+def _run_chunks(play_chunk, totals, num_games, master_seed, workers, num_players):
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # A few chunks per worker keeps the pool busy when some chunks run slower.
+    num_chunks = max(1, min(num_games, workers * 4))
+    bounds = [num_games * i // num_chunks for i in range(num_chunks + 1)]
+    chunks = [
+        (master_seed, start, stop, num_players)
+        for start, stop in zip(bounds, bounds[1:])
+    ]
+
+    if workers == 1:
+        for chunk in chunks:
+            totals.merge(play_chunk(chunk))
+        return totals
+
+    with Pool(workers) as pool:
+        for chunk_totals in pool.imap_unordered(play_chunk, chunks):
+            totals.merge(chunk_totals)
+    return totals
+
+
+def run_tournament(num_games, master_seed=0, workers=None, num_players=4):
+    return _run_chunks(
+        _play_chunk,
+        TournamentTotals(num_players),
+        num_games,
+        master_seed,
+        workers,
+        num_players,
+    )
+
+
+def run_duplicate_tournament(num_deals, master_seed=0, workers=None, num_players=4):
+    return _run_chunks(
+        _play_duplicate_chunk,
+        DuplicateTotals(num_players),
+        num_deals,
+        master_seed,
+        workers,
+        num_players,
+    )
+
+
+def print_duplicate(totals):
+    personalities = create_personalities(len(totals.scores))
+    errors = totals.standard_errors()
+    print(f"Deals played: {totals.deals} ({totals.deals * len(personalities)} games)")
+    for i, personality in enumerate(personalities):
+        mean = totals.relative[i] / max(totals.deals, 1)
+        print(f"{type(personality).__name__}:")
+        print(f"  Total score: {totals.scores[i]}")
+        print(f"  Score against par per deal: {mean:+.3f} ± {errors[i]:.3f}")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--duplicate"]
+    num_games = int(args[0]) if len(args) > 0 else 10000
+    master_seed = int(args[1]) if len(args) > 1 else 0
+    workers = int(args[2]) if len(args) > 2 else None
+
+    if "--duplicate" in sys.argv:
+        print_duplicate(run_duplicate_tournament(num_games, master_seed, workers))
+        return
+
+    totals = run_tournament(num_games, master_seed, workers)
+    personalities = create_personalities(len(totals.scores))
+
+    print(f"Games played: {totals.games}")
+    for i, personality in enumerate(personalities):
+        print(f"Player {i + 1} ({type(personality).__name__}):")
+        print(f"  Total score: {totals.scores[i]}")
+        print(f"  Tricks won: {totals.tricks_won[i]}")
+        print(f"  Contracts made: {totals.contracts_made[i]}/{totals.contracts[i]}")
+        print(f"  Games without a trick: {totals.zero_trick_games[i]}")
+
+
+if __name__ == "__main__":
+    main()
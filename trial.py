@@ -1,13 +1,7 @@
 import random
 
-
-class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
-
-    def __repr__(self):
-        return f"{self.rank}{self.suit}"
+from batak import Card
+from results_store import RESULTS_FILE, ResultWriter
 
 
 class Deck:
@@ -40,7 +34,7 @@ class ConservativePlayer(AIPersonality):
     def lead_card(self, hand, trump_suit, trump_played):
         sorted_hand = sorted(
             hand,
-            key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)),
+            key=lambda c: c.id,
         )
         if not trump_played:
             sorted_hand = [card for card in sorted_hand if card.suit != trump_suit]
@@ -54,7 +48,7 @@ class ConservativePlayer(AIPersonality):
         if not valid_cards:
             valid_cards = hand
 
-        return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+        return min(valid_cards, key=lambda c: c.rank_index)
 
     def bid(self, hand, current_bids):
         num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
@@ -73,8 +67,8 @@ class AggressivePlayer(AIPersonality):
         if not trump_played:
             non_trump_cards = [card for card in hand if card.suit != trump_suit]
             if non_trump_cards:
-                return max(non_trump_cards, key=lambda c: Deck.ranks.index(c.rank))
-        return max(hand, key=lambda c: Deck.ranks.index(c.rank))
+                return max(non_trump_cards, key=lambda c: c.rank_index)
+        return max(hand, key=lambda c: c.rank_index)
 
     def follow_card(self, hand, led_suit, trump_suit, trump_played):
         valid_cards = [card for card in hand if card.suit == led_suit]
@@ -87,14 +81,14 @@ class AggressivePlayer(AIPersonality):
         high_cards = [card for card in valid_cards if card.rank in "JQKA"]
         if high_cards:
             if trump_played:
-                return min(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return min(high_cards, key=lambda c: c.rank_index)
             else:
-                return max(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return max(high_cards, key=lambda c: c.rank_index)
         else:
             if trump_played:
-                return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return min(valid_cards, key=lambda c: c.rank_index)
             else:
-                return max(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return max(valid_cards, key=lambda c: c.rank_index)
 
     def bid(self, hand, current_bids):
         num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
@@ -118,11 +112,11 @@ class BalancedPlayer(AIPersonality):
             low_cards = [card for card in low_cards if card.suit != trump_suit]
 
         if high_cards:
-            return max(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return max(high_cards, key=lambda c: c.rank_index)
         elif low_cards:
-            return min(low_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return min(low_cards, key=lambda c: c.rank_index)
         else:
-            return max(hand, key=lambda c: Deck.ranks.index(c.rank))
+            return max(hand, key=lambda c: c.rank_index)
 
     def follow_card(self, hand, led_suit, trump_suit, trump_played):
         valid_cards = [card for card in hand if card.suit == led_suit]
@@ -133,9 +127,9 @@ class BalancedPlayer(AIPersonality):
             valid_cards = hand
 
         if trump_played:
-            return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return min(valid_cards, key=lambda c: c.rank_index)
         else:
-            return max(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return max(valid_cards, key=lambda c: c.rank_index)
 
     def bid(self, hand, current_bids):
         num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
@@ -155,8 +149,8 @@ class OpportunisticPlayer(AIPersonality):
         if not trump_played:
             high_cards = [card for card in high_cards if card.suit != trump_suit]
         if high_cards:
-            return min(high_cards, key=lambda c: Deck.ranks.index(c.rank))
-        return min(hand, key=lambda c: Deck.ranks.index(c.rank))
+            return min(high_cards, key=lambda c: c.rank_index)
+        return min(hand, key=lambda c: c.rank_index)
 
     def follow_card(self, hand, led_suit, trump_suit, trump_played):
         valid_cards = [card for card in hand if card.suit == led_suit]
@@ -167,13 +161,13 @@ class OpportunisticPlayer(AIPersonality):
             valid_cards = hand
 
         if trump_played:
-            return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+            return min(valid_cards, key=lambda c: c.rank_index)
         else:
             high_cards = [card for card in valid_cards if card.rank in "JQKA"]
             if high_cards:
-                return max(high_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return max(high_cards, key=lambda c: c.rank_index)
             else:
-                return min(valid_cards, key=lambda c: Deck.ranks.index(c.rank))
+                return min(valid_cards, key=lambda c: c.rank_index)
 
     def bid(self, hand, current_bids):
         num_high_cards = sum(1 for card in hand if card.rank in "JQKA")
@@ -190,7 +184,7 @@ class OpportunisticPlayer(AIPersonality):
 class HumanPlayer(AIPersonality):
     def lead_card(self, hand, trump_suit, trump_played):
         print(
-            f"Your hand: {sorted(hand, key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)))}"
+            f"Your hand: {sorted(hand, key=lambda c: c.id)}"
         )
         card_str = input("Choose a card to lead: ").strip()
         card = Card(card_str[0], card_str[1])
@@ -199,7 +193,7 @@ class HumanPlayer(AIPersonality):
 
     def follow_card(self, hand, led_suit, trump_suit, trump_played):
         print(
-            f"Your hand: {sorted(hand, key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)))}"
+            f"Your hand: {sorted(hand, key=lambda c: c.id)}"
         )
         card_str = input("Choose a card to play: ").strip()
         card = Card(card_str[0], card_str[1])
@@ -208,14 +202,19 @@ class HumanPlayer(AIPersonality):
 
     def bid(self, hand, current_bids):
         print(
-            f"Your hand: {sorted(hand, key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)))}"
+            f"Your hand: {sorted(hand, key=lambda c: c.id)}"
         )
-        bid_value = int(input("Enter your bid: "))
-        return bid_value
+        # Scores are stored a signed byte per player, so a bid can be no more
+        # than the tricks in the hand.
+        while True:
+            text = input(f"Enter your bid (1-{len(hand)}): ").strip()
+            if text.isdigit() and 1 <= int(text) <= len(hand):
+                return int(text)
+            print(f"A bid must be a whole number from 1 to {len(hand)}")
 
     def choose_trump_suit(self, hand):
         print(
-            f"Your hand: {sorted(hand, key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)))}"
+            f"Your hand: {sorted(hand, key=lambda c: c.id)}"
         )
         trump_suit = input("Choose a trump suit (♠, ♡, ♢, or ♣): ")
         return trump_suit
@@ -272,18 +271,19 @@ def find_trick_winner(played_cards, trump_suit):
         if card.suit == trump_suit and winning_card.suit != trump_suit:
             winning_card = card
             winner = player
-        elif card.suit == winning_card.suit and Deck.ranks.index(
-            card.rank
-        ) > Deck.ranks.index(winning_card.rank):
+        elif (
+            card.suit == winning_card.suit
+            and card.rank_index > winning_card.rank_index
+        ):
             winning_card = card
             winner = player
 
     return winner
 
 
-def save_results_to_file(results):
-    with open("results.txt", "a") as f:
-        f.write(", ".join(str(points) for points in results) + "\n")
+def save_results_to_file(results, file_name=RESULTS_FILE):
+    with ResultWriter(file_name, len(results)) as writer:
+        writer.write(results)
 
 
 def bidding_phase(hands, personalities):
@@ -296,7 +296,7 @@ def bidding_phase(hands, personalities):
 
         for i in tied_players:
             print(
-                f"Player {i + 1}, your hand: {sorted(hands[i], key=lambda c: (Deck.suits.index(c.suit), Deck.ranks.index(c.rank)))}"
+                f"Player {i + 1}, your hand: {sorted(hands[i], key=lambda c: c.id)}"
             )
             bid = personalities[i].bid(
                 hands[i], [bids[j] for j in tied_players if j != i]
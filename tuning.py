@@ -0,0 +1,304 @@
+import json
+import os
+import random
+import sys
+from multiprocessing import Pool
+
+from batak import (
+    DEFAULT_PERSONALITIES,
+    PERSONALITIES,
+    create_personalities,
+    rank_mask,
+    simulate_game,
+)
+from match import MatchStats
+from tournament import deal_rng
+
+TUNED_FILE = "tuned.json"
+
+# Name, lowest and highest value of every tuned threshold. A personality
+# bids max(bid_floor, high cards // bid_divisor) over the current bid, and
+# counts every card of rank index high_rank or above as high.
+PARAMETERS = (
+    ("bid_divisor", 1, 6),
+    ("bid_floor", 0, 3),
+    ("high_rank", 6, 12),
+)
+
+
+def parameters_of(cls):
+    high_ranks = cls.high_mask & 0x1FFF
+    high_rank = (high_ranks & -high_ranks).bit_length() - 1
+    return (cls.bid_divisor, cls.bid_floor, high_rank)
+
+
+def make_personality(name, base, parameters):
+    bid_divisor, bid_floor, high_rank = parameters
+    return type(
+        name,
+        (PERSONALITIES[base],),
+        {
+            "__module__": __name__,
+            "base": base,
+            "parameters": tuple(parameters),
+            "bid_divisor": bid_divisor,
+            "bid_floor": bid_floor,
+            "high_mask": rank_mask(high_rank),
+        },
+    )
+
+
+def register_personality(name, base, parameters):
+    # Registered personalities can be named in create_personalities, and
+    # pickled since they are attributes of this module.
+    cls = make_personality(name, base, parameters)
+    globals()[name] = PERSONALITIES[name] = cls
+    return cls
+
+
+def load_tuned(path=TUNED_FILE):
+    with open(path, "r") as f:
+        tuned = json.load(f)
+    for name, entry in tuned.items():
+        parameters = [entry["parameters"][parameter] for parameter, _, _ in PARAMETERS]
+        register_personality(name, entry["base"], parameters)
+    return list(tuned)
+
+
+def save_tuned(name, base, parameters, stats, path=TUNED_FILE):
+    tuned = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            tuned = json.load(f)
+    tuned[name] = {
+        "base": base,
+        "parameters": {
+            parameter: value
+            for (parameter, _, _), value in zip(PARAMETERS, parameters)
+        },
+        "deals": stats.games,
+        "mean_gain": stats.mean(),
+    }
+    with open(path, "w") as f:
+        json.dump(tuned, f, indent=2, sort_keys=True)
+
+
+def _lineup(base, deal_index, num_players):
+    # The default table rotated one seat a deal, and the seat `base` sits in.
+    names = DEFAULT_PERSONALITIES[:num_players]
+    if base not in names:
+        raise ValueError(f"{base} is not one of the first {num_players} personalities")
+    rotation = deal_index % num_players
+    names = names[rotation:] + names[:rotation]
+    return create_personalities(num_players, names), names.index(base)
+
+
+def baseline_scores(base, master_seed, start, stop, num_players=4):
+    scores = []
+    for deal_index in range(start, stop):
+        personalities, seat = _lineup(base, deal_index, num_players)
+        rng = deal_rng(master_seed, deal_index)
+        scores.append(simulate_game(num_players, personalities, rng=rng).scores[seat])
+    return scores
+
+
+def evaluate_deals(base, parameters, master_seed, start, stop, baseline, num_players):
+    # The candidate takes the seat of `base` on each deal, scored against
+    # what `base` itself scored there.
+    candidate = make_personality("Candidate", base, parameters)
+    stats = MatchStats()
+    for deal_index, base_score in zip(range(start, stop), baseline):
+        personalities, seat = _lineup(base, deal_index, num_players)
+        personalities[seat] = candidate()
+        rng = deal_rng(master_seed, deal_index)
+        result = simulate_game(num_players, personalities, rng=rng)
+        stats.add(result.scores[seat] - base_score)
+    return stats
+
+
+def _baseline_chunk(args):
+    return baseline_scores(*args)
+
+
+def _evaluate_chunk(args):
+    return args[1], evaluate_deals(*args)
+
+
+def _chunk_bounds(start, stop, num_chunks):
+    num_chunks = max(1, min(stop - start, num_chunks))
+    bounds = [start + (stop - start) * i // num_chunks for i in range(num_chunks + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+def evaluate_population(
+    candidates,
+    base,
+    master_seed,
+    start,
+    num_deals,
+    batch_size,
+    alpha,
+    pool,
+    workers,
+    num_players,
+):
+    # Plays the candidates batch by batch on the same deals. After each batch
+    # a candidate stops once the upper end of its confidence interval falls
+    # below the lower end of the best one's, so clearly bad candidates cost
+    # a single batch.
+    stats = {parameters: MatchStats() for parameters in candidates}
+    live = list(candidates)
+    map_chunks = map if pool is None else pool.imap
+    for batch_start in range(start, start + num_deals, batch_size):
+        batch_stop = min(batch_start + batch_size, start + num_deals)
+        chunks = _chunk_bounds(batch_start, batch_stop, workers)
+        baseline = []
+        for scores in map_chunks(
+            _baseline_chunk,
+            [
+                (base, master_seed, chunk_start, chunk_stop, num_players)
+                for chunk_start, chunk_stop in chunks
+            ],
+        ):
+            baseline.extend(scores)
+
+        chunks = _chunk_bounds(batch_start, batch_stop, -(-workers // len(live)))
+        tasks = [
+            (
+                base,
+                parameters,
+                master_seed,
+                chunk_start,
+                chunk_stop,
+                baseline[chunk_start - batch_start : chunk_stop - batch_start],
+                num_players,
+            )
+            for parameters in live
+            for chunk_start, chunk_stop in chunks
+        ]
+        # Merged in task order so the result does not depend on the workers.
+        for parameters, chunk_stats in map_chunks(_evaluate_chunk, tasks):
+            stats[parameters].merge(chunk_stats)
+
+        best_low = max(
+            stats[parameters].confidence_interval(alpha)[0] for parameters in live
+        )
+        live = [
+            parameters
+            for parameters in live
+            if stats[parameters].confidence_interval(alpha)[1] >= best_low
+        ]
+        if len(live) == 1:
+            break
+    return stats
+
+
+def mutate(parameters, rng, rate):
+    child = []
+    for value, (_, low, high) in zip(parameters, PARAMETERS):
+        if rng.random() < rate:
+            value = min(high, max(low, value + rng.choice((-1, 1))))
+        child.append(value)
+    return tuple(child)
+
+
+def crossover(first, second, rng):
+    return tuple(rng.choice(pair) for pair in zip(first, second))
+
+
+def tune(
+    base,
+    generations=10,
+    population_size=16,
+    elite=4,
+    mutation_rate=0.4,
+    deals_per_generation=2000,
+    batch_size=250,
+    alpha=0.05,
+    master_seed=0,
+    workers=None,
+    num_players=4,
+    log=None,
+):
+    # Genetic search over PARAMETERS starting from the thresholds of `base`.
+    # Every generation plays a fresh range of deals; the elite carry over
+    # and the rest are children of tournament-selected parents. Returns the
+    # best parameters and their stats from the last generation; with no
+    # generations the starting population is evaluated once and its best
+    # is returned.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    rng = random.Random(f"{master_seed}:{base}")
+    start = parameters_of(PERSONALITIES[base])
+    population = [start]
+    for _ in range(population_size * 10):
+        if len(population) == population_size:
+            break
+        candidate = mutate(start, rng, 1.0)
+        if candidate not in population:
+            population.append(candidate)
+
+    rounds = max(generations, 1)
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        for generation in range(rounds):
+            stats = evaluate_population(
+                population,
+                base,
+                master_seed,
+                generation * deals_per_generation,
+                deals_per_generation,
+                batch_size,
+                alpha,
+                pool,
+                workers,
+                num_players,
+            )
+            ranked = sorted(
+                population,
+                key=lambda parameters: (stats[parameters].mean(), parameters),
+                reverse=True,
+            )
+            best = ranked[0]
+            if log is not None:
+                low, high = stats[best].confidence_interval(alpha)
+                log(
+                    f"Generation {generation + 1}: best {best} "
+                    f"{stats[best].mean():+.3f} [{low:+.3f}, {high:+.3f}] "
+                    f"over {stats[best].games} deals"
+                )
+            if generation == rounds - 1:
+                return best, stats[best]
+
+            population = ranked[:elite]
+            for _ in range(population_size * 10):
+                if len(population) == population_size:
+                    break
+                first, second = (
+                    min(rng.sample(ranked, 2), key=ranked.index) for _ in range(2)
+                )
+                child = mutate(crossover(first, second, rng), rng, mutation_rate)
+                if child not in population:
+                    population.append(child)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def main():
+    base = sys.argv[1] if len(sys.argv) > 1 else "BalancedPlayer"
+    generations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    master_seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    parameters, stats = tune(
+        base, generations, master_seed=master_seed, workers=workers, log=print
+    )
+    name = f"Tuned{base}"
+    save_tuned(name, base, parameters, stats)
+    print(f"Saved {name} {parameters} to {TUNED_FILE}")
+
+
+if __name__ == "__main__":
+    main()